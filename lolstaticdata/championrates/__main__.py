@@ -3,11 +3,11 @@ import requests
 import urllib.parse
 import cassiopeia as cass
 
-from ..common.utils import download_soup
+from ..common.utils import download_soup, get_short_patch_version
 
 
 def main():
-    patch = cass.Patch.latest(region="NA")
+    patch = get_short_patch_version()
     query = """query ($region: String, $language: String, $queue: Int, $tier: String, $role: String, $patch: String) {{
   lolChampionsListOverview(region: $region, language: $language, queue: $queue, tier: $tier, role: $role, patch: $patch) {{
     champion_id
@@ -26,7 +26,7 @@ def main():
   }}
 }}
 &variables={{"language":"en","role":"ALL","region":"world","queue":420,"tier":"PLATINUM_PLUS","patch":"{patch}"}}
-""".format(patch=patch.name)
+""".format(patch=patch)
     data = requests.get("https://flash.blitz.gg/graphql?query=" + urllib.parse.quote(query, safe="/()=&")).json()["data"]["lolChampionsListOverview"]
 
     role_name_map = {"TOP": "TOP", "JUNGLE": "JUNGLE", "MID": "MIDDLE", "ADC": "BOTTOM", "SUPPORT": "UTILITY"}
@@ -46,7 +46,7 @@ def main():
         if champion.id not in final:
             final[champion.id] = {}
 
-    final = {"data": final, "patch": patch.name}
+    final = {"data": final, "patch": patch}
 
 
     filename = "/home/meraki/code/meraki/Data/champion-rates/rates.json"
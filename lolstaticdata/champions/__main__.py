@@ -1,88 +1,184 @@
+from typing import Dict, List, Optional, Tuple
 import os
-import json
-from bs4 import BeautifulSoup
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 
-from ..common import utils
-from .pull_champions_wiki import LolWikiDataHandler
-from .pull_champions_dragons import get_ability_url as _get_ability_url
+from ..common.utils import (
+    PATCH_VERSION_ENV,
+    JsonObjectWriter,
+    content_hash,
+    map_bounded,
+    matches_selection,
+    set_patch_version,
+)
+from ..common.buildgraph import BuildGraph
+from .context import RunContext
+from .pull_champions_wiki import LolWikiDataHandler, HTMLAbilityWrapper
+from .modelchampion import Champion
+from .pull_champions_dragons import AbilityIconListing, get_ability_url as _get_ability_url
 
+ABILITY_KEY_TO_IDENTIFIER = {
+    "P": "passive",
+    "Q": "q",
+    "Q2": "q",
+    "W": "w",
+    "E": "e",
+    "R": "r",
+}
 
-def get_ability_filenames(url):
-    soup = utils.download_soup(url, use_cache=False)
-    soup = BeautifulSoup(soup, "lxml")
 
-    filenames = []
-    for td in soup.findAll("td"):
-        a = td.a
-        if a is not None:
-            fn = a["href"]
-            if ".." not in fn:
-                filenames.append(fn)
-    return filenames
+def render_champion(
+    handler: LolWikiDataHandler, name: str, data: dict, abilities: List[List[HTMLAbilityWrapper]] = None
+) -> Champion:
+    champion = handler.render_champion(name, data, abilities)
+    latest_version = handler.context.patch_version
+
+    # Load some information for pulling champion ability icons
+    ddragon_champion = handler.context.ddragon_champions[champion.key]
+    # The directory listing is only downloaded if the icon resolution needs it
+    ability_icon_listing = AbilityIconListing(champion.key, handler.context.cdragon_patch_version)
+
+    # Set the champion icon
+    champion.icon = (
+        f"http://ddragon.leagueoflegends.com/cdn/{latest_version}/img/champion/{ddragon_champion['image']['full']}"
+    )
+
+    # Set the lore
+    champion.lore = ddragon_champion["lore"]
+
+    # Set the champion ability icons
+    for ability_key, abilities in champion.abilities.items():
+        for ability_index, ability in enumerate(abilities, start=1):
+            url = _get_ability_url(
+                champion.key,
+                ABILITY_KEY_TO_IDENTIFIER[ability_key],
+                ability_index,
+                ability.name,
+                latest_version,
+                ddragon_champion,
+                ability_icon_listing,
+            )
+            ability.icon = url
+    return champion
+
+
+def build_champion(
+    handler: LolWikiDataHandler, name: str, data: dict, previous_inputs: Optional[Dict[str, str]]
+) -> Tuple[Optional[Champion], Dict[str, str]]:
+    """Render the champion, or return None instead if none of its inputs changed since it was last built."""
+    abilities = handler.pull_champion_abilities(name, data)
+    try:
+        inputs = handler.champion_inputs(name, data, abilities)
+        inputs["ddragon"] = content_hash(handler.context.ddragon_champions[data["apiname"]])
+        inputs["patch"] = handler.context.patch_version
+        if inputs == previous_inputs:
+            return None, inputs
+        return render_champion(handler, name, data, abilities), inputs
+    finally:
+        handler.context.release_champions()
+
+
+def _champion_output(data: dict) -> str:
+    return os.path.join("champions", str(data["apiname"]) + ".json")
 
 
-def main():
-    handler = LolWikiDataHandler(use_cache=False)
+# Each worker process gets its own copy of the handler (and its preloaded RunContext) once, when it starts
+_worker_handler = None
+
+
+def _init_worker(handler: LolWikiDataHandler):
+    global _worker_handler
+    _worker_handler = handler
+
+
+def _build_champion_in_worker(
+    job: Tuple[str, dict, Optional[Dict[str, str]]],
+) -> Tuple[Optional[Champion], Dict[str, str]]:
+    name, data, previous_inputs = job
+    return build_champion(_worker_handler, name, data, previous_inputs)
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(prog="python -m lolstaticdata.champions")
+    parser.add_argument(
+        "champions",
+        nargs="*",
+        help="only build the champions whose name, key or id matches one of these (glob) patterns, e.g. Ahri, 103 or "
+        "'Kai*', and patch them into the existing champions.json (default: build every champion)",
+    )
+    parser.add_argument(
+        "--jobs", "-j", type=int, default=1, help="number of worker processes used to render champions (default: 1)"
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="rebuild every champion, even those whose inputs didn't change"
+    )
+    parser.add_argument(
+        "--patch",
+        help=f"build this DDragon patch version (e.g. 11.2.1) instead of the latest one; the {PATCH_VERSION_ENV} "
+        "environment variable does the same",
+    )
+    args = parser.parse_args(argv)
+    if args.patch:
+        set_patch_version(args.patch)
+
+    context = RunContext()
+    handler = LolWikiDataHandler(use_cache=False, context=context)
     directory = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), "../.."))
     if not os.path.exists(os.path.join(directory, "champions")):
         os.mkdir(os.path.join(directory, "champions"))
+    graph = BuildGraph("champions", directory)
 
-    # Load some information for pulling champion ability icons
-    latest_version = utils.get_latest_patch_version()
-    ddragon_champions = utils.download_json(
-        f"http://ddragon.leagueoflegends.com/cdn/{latest_version}/data/en_US/championFull.json"
-    )["data"]
-    ability_key_to_identifier = {
-        "P": "passive",
-        "Q": "q",
-        "Q2": "q",
-        "W": "w",
-        "E": "e",
-        "R": "r",
-    }
-
-    champions = []
-    for champion in handler.get_champions():
-        # Load some information for pulling champion ability icons
-        ddragon_champion = ddragon_champions[champion.key]
-        ability_icon_filenames = get_ability_filenames(
-            f"http://raw.communitydragon.org/latest/game/assets/characters/{champion.key.lower()}/hud/icons2d/"
-        )
-
-        # Set the champion icon
-        champion.icon = (
-            f"http://ddragon.leagueoflegends.com/cdn/{latest_version}/img/champion/{ddragon_champion['image']['full']}"
-        )
-
-        # Set the lore
-        champion.lore = ddragon_champion["lore"]
-
-        # Set the champion ability icons
-        for ability_key, abilities in champion.abilities.items():
-            for ability_index, ability in enumerate(abilities, start=1):
-                url = _get_ability_url(
-                    champion.key,
-                    ability_key_to_identifier[ability_key],
-                    ability_index,
-                    ability.name,
-                    latest_version,
-                    ddragon_champion,
-                    ability_icon_filenames,
-                )
-                ability.icon = url
-
-        champions.append(champion)
-        jsonfn = os.path.join(directory, "champions", str(champion.key) + ".json")
-        with open(jsonfn, "w", encoding="utf8") as f:
-            f.write(champion.__json__(indent=2, ensure_ascii=False))
-
-    jsonfn = os.path.join(directory, "champions.json")
-    jsons = {}
-    for champion in champions:
-        jsons[champion.key] = json.loads(champion.__json__(ensure_ascii=False))
-    with open(jsonfn, "w", encoding="utf8") as f:
-        json.dump(jsons, f, indent=2, ensure_ascii=False)
-    del jsons
+    champions = list(handler.get_champion_data())
+    selected = [
+        not args.champions or matches_selection(args.champions, name, data["apiname"], data["id"])
+        for name, data in champions
+    ]
+    if not any(selected):
+        print(f"No champions match {' '.join(args.champions)}")
+        return
+    jobs = [
+        (name, data, None if args.force else graph.previous_inputs(_champion_output(data)))
+        for (name, data), is_selected in zip(champions, selected)
+        if is_selected
+    ]
+    if args.jobs > 1:
+        # Load the shared resources before the workers start so that each of them doesn't download them again
+        context.preload()
+        executor = ProcessPoolExecutor(max_workers=args.jobs, initializer=_init_worker, initargs=(handler,))
+        built = map_bounded(executor, _build_champion_in_worker, jobs, 2 * args.jobs)
+    else:
+        executor = None
+        built = (build_champion(handler, *job) for job in jobs)
+
+    # Each champion is appended to champions.json as soon as it is built and then dropped, so only a handful of
+    # champions are in memory at any time
+    try:
+        with JsonObjectWriter(os.path.join(directory, "champions.json")) as aggregate:
+            for (name, data), is_selected in zip(champions, selected):
+                jsonfn = os.path.join(directory, _champion_output(data))
+                if not is_selected:
+                    # Champions that aren't selected keep what was built last time
+                    if not os.path.exists(jsonfn):
+                        print(f"{name} has never been built, leaving it out of champions.json")
+                        continue
+                    with open(jsonfn, encoding="utf8") as f:
+                        aggregate.write_encoded(data["apiname"], f.read())
+                    continue
+                champion, inputs = next(built)
+                if champion is None:
+                    # Nothing changed, reuse what was built last time
+                    with open(jsonfn, encoding="utf8") as f:
+                        aggregate.write_encoded(data["apiname"], f.read())
+                else:
+                    encoded = champion.__json__(indent=2, ensure_ascii=False)
+                    with open(jsonfn, "w", encoding="utf8") as f:
+                        f.write(encoded)
+                    aggregate.write_encoded(champion.key, encoded)
+                graph.record(_champion_output(data), inputs)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        graph.save()
 
 
 if __name__ == "__main__":
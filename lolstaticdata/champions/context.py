@@ -0,0 +1,147 @@
+from typing import Dict
+import re
+from bs4 import BeautifulSoup
+from slpp import slpp as lua
+
+from ..common.utils import download_soup, download_json, get_latest_patch_version, get_short_patch_version
+
+
+class RunContext:
+    """Resources that are shared by every champion in a run.
+
+    Each resource is downloaded and parsed the first time it is needed and then reused for the rest of the run.
+    """
+
+    def __init__(self):
+        self._ddragon_champions = None
+        self._sales = None
+        self._skin_data = None
+        self._cdragon_champions = {}
+        self._cdragon_skins = {}
+        self._cdragon_chromas = {}
+
+    def preload(self):
+        """Load every resource that is shared between champions, e.g. before handing the context to worker processes."""
+        self.patch_version
+        self.ddragon_champions
+        self.sales
+        self.skin_data
+
+    @property
+    def patch_version(self) -> str:
+        return get_latest_patch_version()
+
+    @property
+    def cdragon_patch_version(self) -> str:
+        """The patch version in the "major.minor" form that CDragon uses, e.g. 10.24 for DDragon's 10.24.1."""
+        return get_short_patch_version()
+
+    @property
+    def ddragon_champions(self) -> Dict:
+        if self._ddragon_champions is None:
+            self._ddragon_champions = download_json(
+                f"http://ddragon.leagueoflegends.com/cdn/{self.patch_version}/data/en_US/championFull.json"
+            )["data"]
+        return self._ddragon_champions
+
+    @property
+    def sales(self) -> Dict:
+        if self._sales is None:
+            self._sales = self._get_sales()
+        return self._sales
+
+    @property
+    def skin_data(self) -> Dict:
+        if self._skin_data is None:
+            self._skin_data = self._get_skins()
+        return self._skin_data
+
+    def cdragon_champion(self, champion_id: int) -> Dict:
+        if champion_id not in self._cdragon_champions:
+            url = f"http://raw.communitydragon.org/pbe/plugins/rcp-be-lol-game-data/global/default/v1/champions/{champion_id}.json"
+            self._cdragon_champions[champion_id] = download_json(url, False)
+        return self._cdragon_champions[champion_id]
+
+    def cdragon_skins(self, champion_id: int) -> Dict[int, Dict]:
+        """The champion's CDragon skins keyed by skin id."""
+        if champion_id not in self._cdragon_skins:
+            skins = {}
+            for skin in self.cdragon_champion(champion_id)["skins"]:
+                skins.setdefault(skin["id"], skin)
+            self._cdragon_skins[champion_id] = skins
+        return self._cdragon_skins[champion_id]
+
+    def cdragon_chromas(self, champion_id: int) -> Dict[int, Dict[int, Dict]]:
+        """The chromas of each of the champion's CDragon skins, keyed by skin id and then by chroma id."""
+        if champion_id not in self._cdragon_chromas:
+            chromas = {}
+            for skin_id, skin in self.cdragon_skins(champion_id).items():
+                chromas[skin_id] = {}
+                for chroma in skin.get("chromas", []):
+                    chromas[skin_id].setdefault(chroma["id"], chroma)
+            self._cdragon_chromas[champion_id] = chromas
+        return self._cdragon_chromas[champion_id]
+
+    def release_champions(self):
+        """Forget the per-champion CDragon data once a champion is built, so that it isn't kept for the rest of the run."""
+        self._cdragon_champions.clear()
+        self._cdragon_skins.clear()
+        self._cdragon_chromas.clear()
+
+    @staticmethod
+    def _get_sales() -> Dict:
+        get_prices = re.compile(r"(\d+) (\d+)")
+        url = f"https://leagueoflegends.fandom.com/wiki/Sales"
+        html = download_soup(url, False)
+        soup = BeautifulSoup(html, "lxml")
+        spans = soup.findAll("div", {"class": "skin_portrait skin-icon"})
+        sale = {}
+        for i in spans:
+            prices = get_prices.findall(i.text)
+            champion = i["data-champion"]
+            if not sale.get(champion):
+                sale[champion] = {}
+                sale[champion]["price"] = 0
+            skin = i["data-skin"]
+            if skin != "":
+                sale[champion][skin] = prices[0][1]
+            else:
+                sale[champion]["price"] = prices[0][1]
+
+        return sale
+
+    @staticmethod
+    def _get_skins() -> Dict:
+        url = f"https://leagueoflegends.fandom.com/wiki/Module:SkinData/data"
+
+        html = download_soup(url, False)
+        soup = BeautifulSoup(html, "lxml")
+
+        # Pull the relevant champData from the html tags
+        spans = soup.find("pre", {"class": "mw-code mw-script"})
+        start = None
+        spans = spans.text.split("\n")
+
+        for i, span in enumerate(spans):
+            if str(span) == "return {":
+                start = i
+                spans[i] = "{"
+        spans = spans[start:]
+        test1 = re.compile(r"\w -- \w|.\w--\w|\w --\w|.\w--\s")
+        for i, span in enumerate(spans):
+            if span in ["-- </pre>", "-- [[Category:Lua]]"]:
+                spans[i] = ""
+
+            if re.search(test1, span):
+                test2 = re.search(test1, span)
+                spans[i] = span.replace(test2.group()[2] + test2.group()[3], " ")
+                span = spans[i]
+
+            comment_start = span.find("--")
+            # text = text.replace("-", " ")
+            if comment_start > -1:
+                spans[i] = span[:comment_start]
+
+        spans = "".join(spans)
+        skin_data = lua.decode(spans)
+        return skin_data
@@ -1,4 +1,5 @@
-from typing import Mapping, List, Union
+from typing import Mapping, List, Sequence, Union
+from abc import abstractmethod
 from dataclasses import dataclass
 import dataclasses_json
 import json
@@ -24,7 +25,7 @@ from ..common.modelcommon import (
     MagicPenetration,
     Stat,
 )
-from ..common.utils import OrderedEnum, ExtendedEncoder
+from ..common.utils import OrderedEnum, ExtendedEncoder, DataclassSerializer, structural_hash, slotted
 
 
 class Resource(OrderedEnum):
@@ -80,6 +81,8 @@ class Role(OrderedEnum):
 
 
 @dataclasses_json.dataclass_json(letter_case=dataclasses_json.LetterCase.CAMEL)
+@structural_hash
+@slotted
 @dataclass
 class Stats(object):
     health: Health
@@ -113,6 +116,8 @@ class Stats(object):
 
 
 @dataclasses_json.dataclass_json(letter_case=dataclasses_json.LetterCase.CAMEL)
+@structural_hash
+@slotted
 @dataclass
 class AttributeRatings(object):
     damage: int
@@ -127,7 +132,76 @@ class AttributeRatings(object):
     difficulty: int
 
 
+class PackedValues(Sequence):
+    """A read-only list of values that is stored in a compact form and computed when it is read.
+
+    It compares and hashes like the equivalent list, and is serialized to it.
+    """
+
+    __slots__ = ()
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        indices = range(self.length)[index]
+        if isinstance(indices, range):
+            return [self._get(i) for i in indices]
+        return self._get(indices)
+
+    @abstractmethod
+    def _get(self, i: int):
+        """The value at the (non-negative, in range) index `i`."""
+
+    @staticmethod
+    def _check_length(length: int) -> int:
+        # Fail here rather than when the values are first read, e.g. for a champion whose number of values is None
+        if not isinstance(length, int) or length < 0:
+            raise TypeError(f"The length of packed values must be a non-negative int, not {length!r}")
+        return length
+
+    def __eq__(self, other):
+        if isinstance(other, Sequence) and not isinstance(other, str):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class RepeatedValues(PackedValues):
+    """The same value for every rank, e.g. the unit of a modifier or a value that doesn't change with the rank."""
+
+    __slots__ = ("value", "length")
+
+    def __init__(self, value, length: int):
+        self.value = value
+        self.length = self._check_length(length)
+
+    def _get(self, i: int):
+        return self.value
+
+
+class LinearValues(PackedValues):
+    """The values start, start + step, start + 2 * step, ..., e.g. of a value "based on level"."""
+
+    __slots__ = ("start", "step", "length")
+
+    def __init__(self, start: Union[int, float], step: Union[int, float], length: int):
+        self.start = start
+        self.step = step
+        self.length = self._check_length(length)
+
+    def _get(self, i: int):
+        return self.start + i * self.step
+
+
 @dataclasses_json.dataclass_json(letter_case=dataclasses_json.LetterCase.CAMEL)
+@structural_hash
+@slotted
 @dataclass
 class Modifier(object):
     values: List[Union[int, float]]
@@ -135,6 +209,8 @@ class Modifier(object):
 
 
 @dataclasses_json.dataclass_json(letter_case=dataclasses_json.LetterCase.CAMEL)
+@structural_hash
+@slotted
 @dataclass
 class Cooldown(object):
     modifiers: List[Modifier]
@@ -142,12 +218,16 @@ class Cooldown(object):
 
 
 @dataclasses_json.dataclass_json(letter_case=dataclasses_json.LetterCase.CAMEL)
+@structural_hash
+@slotted
 @dataclass
 class Cost(object):
     modifiers: List[Modifier]
 
 
 @dataclasses_json.dataclass_json(letter_case=dataclasses_json.LetterCase.CAMEL)
+@structural_hash
+@slotted
 @dataclass
 class Leveling(object):
     attribute: str
@@ -155,6 +235,8 @@ class Leveling(object):
 
 
 @dataclasses_json.dataclass_json(letter_case=dataclasses_json.LetterCase.CAMEL)
+@structural_hash
+@slotted
 @dataclass
 class Effect(object):
     description: str
@@ -162,6 +244,8 @@ class Effect(object):
 
 
 @dataclasses_json.dataclass_json(letter_case=dataclasses_json.LetterCase.CAMEL)
+@structural_hash
+@slotted
 @dataclass
 class Ability(object):
     name: str
@@ -195,6 +279,8 @@ class Ability(object):
 
 
 @dataclasses_json.dataclass_json(letter_case=dataclasses_json.LetterCase.CAMEL)
+@structural_hash
+@slotted
 @dataclass
 class Price(object):
     blue_essence: int
@@ -203,6 +289,8 @@ class Price(object):
 
 
 @dataclasses_json.dataclass_json(letter_case=dataclasses_json.LetterCase.CAMEL)
+@structural_hash
+@slotted
 @dataclass
 class Description(object):
     description: str
@@ -210,6 +298,8 @@ class Description(object):
 
 
 @dataclasses_json.dataclass_json(letter_case=dataclasses_json.LetterCase.CAMEL)
+@structural_hash
+@slotted
 @dataclass
 class Rarities(object):
     rarity: int
@@ -217,6 +307,8 @@ class Rarities(object):
 
 
 @dataclasses_json.dataclass_json(letter_case=dataclasses_json.LetterCase.CAMEL)
+@structural_hash
+@slotted
 @dataclass
 class Chroma(object):
     name: str
@@ -228,6 +320,8 @@ class Chroma(object):
 
 
 @dataclasses_json.dataclass_json(letter_case=dataclasses_json.LetterCase.CAMEL)
+@structural_hash
+@slotted
 @dataclass
 class Skin(object):
     name: str
@@ -259,6 +353,8 @@ class Skin(object):
 
 
 @dataclasses_json.dataclass_json(letter_case=dataclasses_json.LetterCase.CAMEL)
+@structural_hash
+@slotted
 @dataclass
 class Champion(object):
     id: int
@@ -282,12 +378,9 @@ class Champion(object):
     skins: List[Skin]
 
     def __json__(self, *args, **kwargs):
-        # Use dataclasses_json to get the dict
-        d = self.to_dict()
-        # Delete the two stat objects that don't apply to champions
-        for name, stat in d["stats"].items():
-            if isinstance(stat, dict):
-                del stat["percentBase"]
-                del stat["percentBonus"]
-        # Return the (un)modified dict
+        # Get the same dict as dataclasses_json's to_dict, without the two stat attributes that don't apply to champions
+        d = _serialize_champion(self)
         return json.dumps(d, cls=ExtendedEncoder, *args, **kwargs)
+
+
+_serialize_champion = DataclassSerializer(exclude={Stat: ("percent_base", "percent_bonus")})
@@ -1,14 +1,62 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from collections import Counter
 from fuzzywuzzy import fuzz
-from functools import partial
+from fuzzywuzzy.utils import intr
+from bs4 import BeautifulSoup
 
+from ..common.utils import download_soup
 
-def maximize(func, guesses):
-    best = None, -float("inf")
-    for params in guesses:
-        value = func(params)
-        if value > best[1]:
-            best = params, value
-    return best
+
+class FilenameMatcher:
+    """Finds the filename with the highest fuzz.ratio to a guess, the earliest one if several tie.
+
+    The filenames are indexed once by character. For a guess, the number of characters it shares with a filename
+    bounds the fuzz.ratio between them from above, so filenames are scored in order of decreasing bound and the
+    search stops as soon as no remaining filename can beat the best score. Results are memoized per guess, which
+    makes the guesses that don't depend on the ability (and so repeat for every ability of a champion) free.
+    """
+
+    def __init__(self, filenames: Iterable[str]):
+        self.filenames = list(filenames)
+        self._lengths = [len(fn) for fn in self.filenames]
+        # character -> [(filename index, number of times the character appears in the filename), ...]
+        self._postings = {}  # type: Dict[str, List[Tuple[int, int]]]
+        for i, fn in enumerate(self.filenames):
+            for c, count in Counter(fn).items():
+                self._postings.setdefault(c, []).append((i, count))
+        self._memo = {}  # type: Dict[str, Tuple[Optional[str], float]]
+
+    def _upper_bounds(self, guess: str) -> List[int]:
+        shared = [0] * len(self.filenames)
+        for c, count in Counter(guess).items():
+            for i, fn_count in self._postings.get(c, ()):
+                shared[i] += min(count, fn_count)
+        length = len(guess)
+        # fuzz.ratio of two empty strings is 100
+        return [
+            intr(100 * 2 * shared[i] / (length + self._lengths[i])) if length + self._lengths[i] else 100
+            for i in range(len(self.filenames))
+        ]
+
+    def best_match(self, guess: str) -> Tuple[Optional[str], float]:
+        if guess in self._memo:
+            return self._memo[guess]
+        bounds = self._upper_bounds(guess)
+        best_index, best_score = None, -float("inf")
+        for i in sorted(range(len(self.filenames)), key=lambda i: (-bounds[i], i)):
+            if bounds[i] < best_score:
+                break
+            if bounds[i] == best_score and i > best_index:
+                continue  # At best a tie, and ties go to the earlier filename
+            score = fuzz.ratio(guess, self.filenames[i])
+            if score > best_score or (score == best_score and i < best_index):
+                best_index, best_score = i, score
+        best = (self.filenames[best_index] if best_index is not None else None), best_score
+        self._memo[guess] = best
+        return best
+
+    def best_matches(self, guesses: Iterable[str]) -> List[Tuple[Optional[str], float]]:
+        return [self.best_match(guess) for guess in guesses]
 
 
 def build_guess(
@@ -50,6 +98,8 @@ def perform_guess(
     filenames,
     use_underscores=True,
 ):
+    """Guess which of the filenames (a list, or a FilenameMatcher to share its index between abilities) is the icon."""
+    matcher = filenames if isinstance(filenames, FilenameMatcher) else FilenameMatcher(filenames)
     best_score = -float("inf")
     for include_champion_name in (True, False):
         for include_ability_name in (True, False):
@@ -74,11 +124,51 @@ def perform_guess(
                         include_ability_index,
                         use_underscores=use_underscores,
                     )
-                    _fn, score = maximize(partial(fuzz.ratio, guess), filenames)
+                    _fn, score = matcher.best_match(guess)
                     if score > best_score:
                         best_fn, best_score, best_guess = _fn, score, guess
     return best_fn, best_score, best_guess
 
 
-def get_ability_url(key, ability_key, ability_index, ability_name, latest_version, ddragon_champion, filenames):
+def get_ability_filenames(url, use_cache: bool = True) -> List[str]:
+    soup = download_soup(url, use_cache=use_cache)
+    soup = BeautifulSoup(soup, "lxml")
+
+    filenames = []
+    for td in soup.findAll("td"):
+        a = td.a
+        if a is not None:
+            fn = a["href"]
+            if ".." not in fn:
+                filenames.append(fn)
+    return filenames
+
+
+class AbilityIconListing:
+    """The files in a champion's CDragon hud/icons2d/ directory.
+
+    Nothing is downloaded until `filenames` is first used. A patch's listing never changes, so it is cached on disk
+    for that patch; the "latest" listing is always downloaded again.
+    """
+
+    def __init__(self, champion_key: str, patch: str = "latest"):
+        self.url = f"http://raw.communitydragon.org/{patch}/game/assets/characters/{champion_key.lower()}/hud/icons2d/"
+        self.use_cache = patch != "latest"
+        self._filenames = None
+        self._matcher = None
+
+    @property
+    def filenames(self) -> List[str]:
+        if self._filenames is None:
+            self._filenames = get_ability_filenames(self.url, use_cache=self.use_cache)
+        return self._filenames
+
+    @property
+    def matcher(self) -> FilenameMatcher:
+        if self._matcher is None:
+            self._matcher = FilenameMatcher(self.filenames)
+        return self._matcher
+
+
+def get_ability_url(key, ability_key, ability_index, ability_name, latest_version, ddragon_champion, listing):
     return f"https://cdn.communitydragon.org/latest/champion/{key}/ability-icon/{ability_key[0]}"
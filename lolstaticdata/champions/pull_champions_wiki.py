@@ -1,9 +1,11 @@
 from typing import Tuple, List, Union, Iterator, Dict
 import re
+import copy
 from bs4 import BeautifulSoup
 from collections import Counter
 from slpp import slpp as lua
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 from ..common.modelcommon import (
     DamageType,
@@ -31,8 +33,10 @@ from ..common.utils import (
     parse_top_level_parentheses,
     grouper,
     to_enum_like,
-    download_json,
+    cached_parse,
+    content_hash,
 )
+from .context import RunContext
 from .modelchampion import (
     Champion,
     Stats,
@@ -45,6 +49,8 @@ from .modelchampion import (
     Price,
     Resource,
     Modifier,
+    RepeatedValues,
+    LinearValues,
     Role,
     Leveling,
     Skin,
@@ -59,15 +65,26 @@ class UnparsableLeveling(Exception):
 
 
 class HTMLAbilityWrapper:
-    def __init__(self, soup):
-        self.soup = soup
-        self.table = self.soup.find_all(["th", "td"])
+    def __init__(self, data: Dict[str, List[str]], content_hash: str = None):
+        # {parameter: [text, html source]}
+        self.content_hash = content_hash
+        self.data = {parameter: text for parameter, (text, source) in data.items()}
+        self.sources = {parameter: source for parameter, (text, source) in data.items()}
+
+    @classmethod
+    def from_html(cls, html: str, url: str) -> "HTMLAbilityWrapper":
+        return cls(cached_parse("ability-v2", url, html, cls._parse_table), content_hash(html))
+
+    @staticmethod
+    def _parse_table(html: str) -> Dict[str, List[str]]:
+        soup = BeautifulSoup(html, "lxml")
+        table = soup.find_all(["th", "td"])
         # Do a little html modification based on the "viewsource"
-        strip_table = [item.text.strip() for item in self.table]
+        strip_table = [item.text.strip() for item in table]
         start = strip_table.index("Parameter") + 3
-        self.table = self.table[start:]
-        self.data = {}
-        for i, (parameter, value, desc) in enumerate(grouper(self.table, 3)):
+        table = table[start:]
+        data = {}
+        for i, (parameter, value, desc) in enumerate(grouper(table, 3)):
             if not value:
                 continue
             if i == 0:  # parameter is '1' for some reason but it's the ability name
@@ -77,13 +94,15 @@ class HTMLAbilityWrapper:
             # desc = desc.text.strip()
             text = value.text.strip()
             if text:
-                self.data[parameter] = value
+                data[parameter] = [text, str(value)]
+        return data
 
     def __getitem__(self, item):
-        return self.data[item].text.strip()
+        return self.data[item]
 
     def __delitem__(self, item):
         del self.data[item]
+        del self.sources[item]
 
     def get(self, item, backup=None):
         try:
@@ -93,15 +112,12 @@ class HTMLAbilityWrapper:
 
     def get_source(self, item, backup=None):
         try:
-            return self.data[item]
+            return self.sources[item]
         except KeyError:
             return backup
 
     def __str__(self):
-        d = {}
-        for key in self.data:
-            d[key] = self[key]
-        return str(d)
+        return str(self.data)
 
 
 class LolWikiDataHandler:
@@ -118,8 +134,12 @@ class LolWikiDataHandler:
         "Taliyah": ["Seismic Shove 2"],
     }
 
-    def __init__(self, use_cache: bool = True):
+    SKILL_KEYS = ("skill_i", "skill_q", "skill_w", "skill_e", "skill_r")
+    ABILITY_FETCH_WORKERS = 8
+
+    def __init__(self, use_cache: bool = True, context: RunContext = None):
         self.use_cache = use_cache
+        self.context = context if context is not None else RunContext()
 
     def check_ability(self, data):
         for x in data:
@@ -129,6 +149,11 @@ class LolWikiDataHandler:
                 return False
 
     def get_champions(self) -> Iterator[Champion]:
+        for name, d in self.get_champion_data():
+            yield self.render_champion(name, d)
+
+    def get_champion_data(self) -> Iterator[Tuple[str, Dict]]:
+        """Yield the decoded Module:ChampionData entry of every released champion."""
         # Download the page source
         url = "https://leagueoflegends.fandom.com/wiki/Module:ChampionData/data"
         html = download_soup(url, self.use_cache)
@@ -152,11 +177,7 @@ class LolWikiDataHandler:
         spans = "".join(spans)
         data = lua.decode(spans)
 
-        # Return the champData as a list of Champions
-        self.skin_data = self._get_skins()
-
         for name, d in data.items():
-            print(name)
             if name in [
                 "Kled & Skaarl",
                 "GnarBig",
@@ -175,10 +196,30 @@ class LolWikiDataHandler:
                 or datetime.strptime(d["date"], "%Y-%m-%d") > datetime.today()
             ):  # Champion not released yet
                 continue
-            champion = self._render_champion_data(name, d)
-            yield champion
-
-    def _render_champion_data(self, name: str, data: Dict) -> Champion:
+            yield name, d
+
+    def render_champion(self, name: str, data: Dict, abilities: List[List[HTMLAbilityWrapper]] = None) -> Champion:
+        print(name)
+        return self._render_champion_data(name, data, abilities)
+
+    def champion_inputs(self, name: str, data: Dict, abilities: List[List[HTMLAbilityWrapper]]) -> Dict[str, str]:
+        """The content hashes of everything that goes into rendering the champion."""
+        inputs = {
+            "championdata": content_hash(data),
+            "skindata": content_hash(self.context.skin_data.get(name)),
+            "sale": content_hash(self.context.sales.get(name)),
+            "cdragon": content_hash(self.context.cdragon_champion(self.context.skin_data[name]["id"])),
+        }
+        for skill_key, skill_abilities in zip(LolWikiDataHandler.SKILL_KEYS, abilities):
+            for i, ability in enumerate(skill_abilities):
+                inputs[f"{skill_key}/{i}"] = ability.content_hash
+        return inputs
+
+    def _render_champion_data(
+        self, name: str, data: Dict, abilities: List[List[HTMLAbilityWrapper]] = None
+    ) -> Champion:
+        if abilities is None:
+            abilities = self.pull_champion_abilities(name, data)
 
         adaptive_type = data["adaptivetype"]
         if adaptive_type.upper() in ("PHYSICAL", "MIXED,PHYSICAL"):
@@ -191,7 +232,7 @@ class LolWikiDataHandler:
             patch = data["patch"][1:]
         else:
             patch = data["patch"]
-        sale = self._get_sale()
+        sale = self.context.sales
         sale_price = 0
         if name in sale:
             if sale[name]["price"] != 0:
@@ -291,63 +332,7 @@ class LolWikiDataHandler:
                 difficulty=data["difficulty"],
             ),
             abilities=dict(
-                [
-                    self._render_abilities(
-                        champion_name=name,
-                        abilities=[
-                            self._pull_champion_ability(champion_name=name, ability_name=ability_name)
-                            for ability_name in data["skill_i"].values()
-                            if not (
-                                name in LolWikiDataHandler.MISSING_SKILLS
-                                and ability_name in LolWikiDataHandler.MISSING_SKILLS[name]
-                            )
-                        ],
-                    ),
-                    self._render_abilities(
-                        champion_name=name,
-                        abilities=[
-                            self._pull_champion_ability(champion_name=name, ability_name=ability_name)
-                            for ability_name in data["skill_q"].values()
-                            if not (
-                                name in LolWikiDataHandler.MISSING_SKILLS
-                                and ability_name in LolWikiDataHandler.MISSING_SKILLS[name]
-                            )
-                        ],
-                    ),
-                    self._render_abilities(
-                        champion_name=name,
-                        abilities=[
-                            self._pull_champion_ability(champion_name=name, ability_name=ability_name)
-                            for ability_name in data["skill_w"].values()
-                            if not (
-                                name in LolWikiDataHandler.MISSING_SKILLS
-                                and ability_name in LolWikiDataHandler.MISSING_SKILLS[name]
-                            )
-                        ],
-                    ),
-                    self._render_abilities(
-                        champion_name=name,
-                        abilities=[
-                            self._pull_champion_ability(champion_name=name, ability_name=ability_name)
-                            for ability_name in data["skill_e"].values()
-                            if not (
-                                name in LolWikiDataHandler.MISSING_SKILLS
-                                and ability_name in LolWikiDataHandler.MISSING_SKILLS[name]
-                            )
-                        ],
-                    ),
-                    self._render_abilities(
-                        champion_name=name,
-                        abilities=[
-                            self._pull_champion_ability(champion_name=name, ability_name=ability_name)
-                            for ability_name in data["skill_r"].values()
-                            if not (
-                                name in LolWikiDataHandler.MISSING_SKILLS
-                                and ability_name in LolWikiDataHandler.MISSING_SKILLS[name]
-                            )
-                        ],
-                    ),
-                ]
+                self._render_abilities(champion_name=name, abilities=skill_abilities) for skill_abilities in abilities
             ),
             release_date=data["date"],
             release_patch=patch,
@@ -361,6 +346,40 @@ class LolWikiDataHandler:
         # "disp_name": "dispName",
         return champion
 
+    def pull_champion_abilities(self, champion_name: str, data: Dict) -> List[List[HTMLAbilityWrapper]]:
+        """Fetch and wrap all of a champion's abilities concurrently, grouped by skill in SKILL_KEYS order."""
+        ability_names = [
+            [
+                ability_name
+                for ability_name in data[skill_key].values()
+                if not (
+                    champion_name in LolWikiDataHandler.MISSING_SKILLS
+                    and ability_name in LolWikiDataHandler.MISSING_SKILLS[champion_name]
+                )
+            ]
+            for skill_key in LolWikiDataHandler.SKILL_KEYS
+        ]
+        with ThreadPoolExecutor(max_workers=LolWikiDataHandler.ABILITY_FETCH_WORKERS) as executor:
+            # A champion may list the same ability more than once, it is only fetched once
+            futures = {}
+            for skill_ability_names in ability_names:
+                for ability_name in skill_ability_names:
+                    if ability_name not in futures:
+                        futures[ability_name] = executor.submit(
+                            self._pull_champion_ability, champion_name, ability_name
+                        )
+            # _render_abilities changes the wrappers, so every other occurrence of an ability gets its own copy
+            wrappers = []
+            seen = set()
+            for skill_ability_names in ability_names:
+                skill_wrappers = []
+                for ability_name in skill_ability_names:
+                    wrapper = futures[ability_name].result()
+                    skill_wrappers.append(copy.deepcopy(wrapper) if ability_name in seen else wrapper)
+                    seen.add(ability_name)
+                wrappers.append(skill_wrappers)
+            return wrappers
+
     def _pull_champion_ability(self, champion_name, ability_name) -> HTMLAbilityWrapper:
         ability_name = ability_name.replace(" ", "_")
 
@@ -371,8 +390,7 @@ class LolWikiDataHandler:
         if url in "https://leagueoflegends.fandom.com/wiki/Template:Data_Pyke/Gift_of_the_Drowned_Ones":
             url = "https://leagueoflegends.fandom.com/wiki/User:Dryan426/Sandbox"
         html = download_soup(url, self.use_cache)
-        soup = BeautifulSoup(html, "lxml")
-        return HTMLAbilityWrapper(soup)
+        return HTMLAbilityWrapper.from_html(html, url)
 
     def _render_abilities(self, champion_name, abilities: List[HTMLAbilityWrapper]) -> Tuple[str, List[Ability]]:
         inputs, abilities = abilities, []  # rename variables
@@ -536,16 +554,15 @@ class LolWikiDataHandler:
         if skill_key == "I":
             skill_key = "P"
         # Check for duplicate abilities
-        hashes = []
+        seen = set()
         unique_abilities = []
         for ability in abilities:
-            h = hash(str(ability))
-            if h not in hashes:
-                hashes.append(h)
+            if ability not in seen:
+                seen.add(ability)
                 unique_abilities.append(ability)
         return skill_key, unique_abilities
 
-    def _render_levelings(self, html: BeautifulSoup, nvalues: int) -> List[Leveling]:
+    def _render_levelings(self, html: Union[str, BeautifulSoup], nvalues: int) -> List[Leveling]:
         # Do some pre-processing on the html
         if not isinstance(html, str):
             html = str(html)
@@ -613,8 +630,8 @@ class LolWikiDataHandler:
                     value = 3
                     lvling = "% per 1% of health lost in the past 4 seconds"
                 modifier = Modifier(
-                    values=[value for _ in range(nvalues)],
-                    units=[lvling for _ in range(nvalues)],
+                    values=RepeatedValues(value, nvalues),
+                    units=RepeatedValues(lvling, nvalues),
                 )
                 modifiers.append(modifier)
         return modifiers
@@ -640,29 +657,6 @@ class LolWikiDataHandler:
         )
         return cooldown
 
-    def _get_sale(self):
-
-        get_prices = re.compile(r"(\d+) (\d+)")
-        url = f"https://leagueoflegends.fandom.com/wiki/Sales"
-        # temporary fix for pyke passive
-        html = download_soup(url, False)
-        soup = BeautifulSoup(html, "lxml")
-        spans = soup.findAll("div", {"class": "skin_portrait skin-icon"})
-        sale = {}
-        for i in spans:
-            prices = get_prices.findall(i.text)
-            champion = i["data-champion"]
-            if not sale.get(champion):
-                sale[champion] = {}
-                sale[champion]["price"] = 0
-            skin = i["data-skin"]
-            if skin is not "":
-                sale[champion][skin] = prices[0][1]
-            else:
-                sale[champion]["price"] = prices[0][1]
-
-        return sale
-
     def _get_skin_id(self, id, skin_id):
         if skin_id < 10:
             id_test = str(id) + "00" + str(skin_id)
@@ -675,66 +669,30 @@ class LolWikiDataHandler:
 
         return id_test
 
-    def _get_chroma_attribs(self, id, name):
-        if "chromas" in self.cdragDict[0]:
-            for c in self.cdragDict[0]["chromas"]:
-                if int(id) == c["id"]:
-                    descriptions = []
-                    rarities = []
-                    if c["descriptions"]:
-                        for desc in c["descriptions"]:
-                            descriptions.append(Description(desc["description"], desc["region"]))
-                    else:
-                        descriptions.append(Description(None, None))
-                    if c["rarities"]:
-                        for rarity in c["rarities"]:
-                            rarities.append(Rarities(rarity["rarity"], rarity["region"]))
-                    else:
-                        rarities.append(Rarities(None, None))
-                    chroma = Chroma(
-                        name=name,
-                        id=c["id"],
-                        chroma_path=self._get_skin_path(c["chromaPath"]),
-                        colors=c["colors"],
-                        descriptions=descriptions,
-                        rarities=rarities,
-                    )
-                    return chroma
-
-    def _get_skins(self):
-        url = f"https://leagueoflegends.fandom.com/wiki/Module:SkinData/data"
-
-        html = download_soup(url, False)
-        soup = BeautifulSoup(html, "lxml")
-
-        # Pull the relevant champData from the html tags
-        spans = soup.find("pre", {"class": "mw-code mw-script"})
-        start = None
-        spans = spans.text.split("\n")
-
-        for i, span in enumerate(spans):
-            if str(span) == "return {":
-                start = i
-                spans[i] = "{"
-        spans = spans[start:]
-        test1 = re.compile("\w -- \w|.\w--\w|\w --\w|.\w--\s")
-        for i, span in enumerate(spans):
-            if span in ["-- </pre>", "-- [[Category:Lua]]"]:
-                spans[i] = ""
-
-            if re.search(test1, span):
-                test2 = re.search(test1, span)
-                spans[i] = span.replace(test2.group()[2] + test2.group()[3], " ")
-                span = spans[i]
-
-            comment_start = span.find("--")
-            # text = text.replace("-", " ")
-            if comment_start > -1:
-                spans[i] = span[:comment_start]
-
-        spans = "".join(spans)
-        skin_data = lua.decode(spans)
-        return skin_data
+    def _get_chroma_attribs(self, cdrag_chromas, id, name):
+        c = cdrag_chromas.get(int(id))
+        if c is not None:
+            descriptions = []
+            rarities = []
+            if c["descriptions"]:
+                for desc in c["descriptions"]:
+                    descriptions.append(Description(desc["description"], desc["region"]))
+            else:
+                descriptions.append(Description(None, None))
+            if c["rarities"]:
+                for rarity in c["rarities"]:
+                    rarities.append(Rarities(rarity["rarity"], rarity["region"]))
+            else:
+                rarities.append(Rarities(None, None))
+            chroma = Chroma(
+                name=name,
+                id=c["id"],
+                chroma_path=self._get_skin_path(c["chromaPath"]),
+                colors=c["colors"],
+                descriptions=descriptions,
+                rarities=rarities,
+            )
+            return chroma
 
     def _get_skin_path(self, path):
         if "/assets/ASSETS" in path:
@@ -751,14 +709,11 @@ class LolWikiDataHandler:
         """
         Pulls champion skin data from wiki and cdragon
         """
-        champ_data = self.skin_data[name]["skins"]
+        champ_data = self.context.skin_data[name]["skins"]
         skins = []
-        champ_id = self.skin_data[name]["id"]
-
-        cdragon = "http://raw.communitydragon.org/pbe/plugins/rcp-be-lol-game-data/global/default/v1/champions/{0}.json".format(
-            champ_id
-        )
-        cdrag_json = download_json(cdragon, False)
+        champ_id = self.context.skin_data[name]["id"]
+        cdrag_skins = self.context.cdragon_skins(champ_id)
+        cdrag_chromas = self.context.cdragon_chromas(champ_id)
 
         for s in champ_data:
             # Default values for LOL Wiki attributes
@@ -778,25 +733,22 @@ class LolWikiDataHandler:
             splash_arist = []
             loot_eligible = True
             lore = None
-            cdragon_ids = []
-            self.cdragDict = [i for i in cdrag_json["skins"] if i["id"] == int(skin_ID)]  # Cdragon Dict
-            for skin in cdrag_json["skins"]:
-                cdragon_ids.append(skin["id"])
-            if int(skin_ID) not in cdragon_ids:
+            cdrag_skin = cdrag_skins.get(int(skin_ID))
+            if cdrag_skin is None:
                 continue
             # cdragon attributes
 
-            is_base = self.cdragDict[0]["isBase"]
-            splash_path = self._get_skin_path(self.cdragDict[0]["splashPath"])
-            uncentered_splash_path = self._get_skin_path(self.cdragDict[0]["uncenteredSplashPath"])
-            tile_path = self._get_skin_path(self.cdragDict[0]["tilePath"])
-            load_screen_path = self._get_skin_path(self.cdragDict[0]["loadScreenPath"])
-            if "loadScreenVintagePath" in self.cdragDict[0]:
-                load_screen_vintage_path = self._get_skin_path(self.cdragDict[0]["loadScreenVintagePath"])
+            is_base = cdrag_skin["isBase"]
+            splash_path = self._get_skin_path(cdrag_skin["splashPath"])
+            uncentered_splash_path = self._get_skin_path(cdrag_skin["uncenteredSplashPath"])
+            tile_path = self._get_skin_path(cdrag_skin["tilePath"])
+            load_screen_path = self._get_skin_path(cdrag_skin["loadScreenPath"])
+            if "loadScreenVintagePath" in cdrag_skin:
+                load_screen_vintage_path = self._get_skin_path(cdrag_skin["loadScreenVintagePath"])
             else:
                 load_screen_vintage_path = None
 
-            rarity = self.cdragDict[0]["rarity"][1:]
+            rarity = cdrag_skin["rarity"][1:]
 
             if "neweffects" in champ_data[s]:
                 new_effects = True
@@ -817,6 +769,7 @@ class LolWikiDataHandler:
                 for chroma in champ_data[s]["chromas"]:
                     chromas.append(
                         self._get_chroma_attribs(
+                            cdrag_chromas[int(skin_ID)],
                             self._get_skin_id(champ_id, champ_data[s]["chromas"][chroma]["id"]),
                             chroma,
                         )
@@ -915,7 +868,7 @@ class ParsingAndRegex:
     def parse_based_on_level(start, stop):
         # e.g. 5 − 139 (based on level)
         delta = (stop - start) / 17.0
-        values = [start + i * delta for i in range(18)]
+        values = LinearValues(start, delta, 18)
         return values
 
     @staticmethod
@@ -945,7 +898,7 @@ class ParsingAndRegex:
             number = eval(number)
             if nvalues is None:
                 nvalues = len(numbers)
-            values = [number for _ in range(nvalues)]
+            values = RepeatedValues(number, nvalues)
             assert len(values) == nvalues
             return not_parsed, values
         raise UnparsableLeveling(f"Could not parse a simple flat value: {string}")
@@ -960,7 +913,7 @@ class ParsingAndRegex:
     def get_modifier(mod: str, nvalues: int) -> [List[str], List[Union[int, float]]]:
         units, parsed = ParsingAndRegex.regex_simple_flat(mod, nvalues)
         units = ParsingAndRegex.get_units(units)
-        units = [units for _ in range(len(parsed))]
+        units = RepeatedValues(units, len(parsed))
         return units, parsed
 
     @staticmethod
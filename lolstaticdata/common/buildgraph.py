@@ -0,0 +1,61 @@
+from typing import Dict, Optional
+import os
+import json
+
+from .utils import content_hash
+
+
+def source_hash() -> str:
+    """Hash the source code of the package, so that changing any parser invalidates everything built with it."""
+    package = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+    hashes = []
+    for root, dirs, files in os.walk(package):
+        dirs.sort()
+        for fn in sorted(files):
+            if fn.endswith(".py"):
+                with open(os.path.join(root, fn), "rb") as f:
+                    hashes.append((os.path.relpath(os.path.join(root, fn), package), content_hash(f.read())))
+    return content_hash(hashes)
+
+
+class BuildGraph:
+    """Records the content hashes of the inputs that each output file was built from.
+
+    An output has to be rebuilt when it doesn't exist, when the hash of any of its inputs changed, or when the package's
+    source code changed since it was written. Outputs are named by their path relative to `directory`; the graph is
+    stored in __cache__/buildgraph_<name>.json.
+    """
+
+    def __init__(self, name: str, directory: str):
+        self.directory = directory
+        cache = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), "../../__cache__"))
+        if not os.path.exists(cache):
+            os.mkdir(cache)
+        self.filename = os.path.join(cache, f"buildgraph_{name}.json")
+        self.source_hash = source_hash()
+        if os.path.exists(self.filename):
+            with open(self.filename, encoding="utf-8") as f:
+                self.outputs = json.load(f)
+        else:
+            self.outputs = {}
+
+    def previous_inputs(self, output: str) -> Optional[Dict[str, str]]:
+        """The input hashes `output` was built from, or None if it has to be rebuilt regardless of its inputs."""
+        entry = self.outputs.get(output)
+        if entry is None or entry["source"] != self.source_hash:
+            return None
+        if not os.path.exists(os.path.join(self.directory, output)):
+            return None
+        return entry["inputs"]
+
+    def is_fresh(self, output: str, inputs: Dict[str, str]) -> bool:
+        return self.previous_inputs(output) == inputs
+
+    def record(self, output: str, inputs: Dict[str, str]):
+        self.outputs[output] = {"source": self.source_hash, "inputs": inputs}
+
+    def save(self):
+        tmp = f"{self.filename}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.outputs, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.filename)
@@ -2,7 +2,7 @@ from typing import Union
 from dataclasses import dataclass
 import dataclasses_json
 
-from .utils import OrderedEnum
+from .utils import OrderedEnum, structural_hash, slotted
 
 Number = Union[float, int]
 
@@ -17,6 +17,8 @@ class DamageType(OrderedEnum):
 
 
 @dataclasses_json.dataclass_json(letter_case=dataclasses_json.LetterCase.CAMEL)
+@structural_hash
+@slotted
 @dataclass
 class Stat:
     flat: Number = 0.0
@@ -66,87 +68,87 @@ class Stat:
 
 
 class Health(Stat):
-    pass
+    __slots__ = ()
 
 
 class HealthRegen(Stat):
-    pass
+    __slots__ = ()
 
 
 class Mana(Stat):
-    pass
+    __slots__ = ()
 
 
 class ManaRegen(Stat):
-    pass
+    __slots__ = ()
 
 
 class Armor(Stat):
-    pass
+    __slots__ = ()
 
 
 class MagicResistance(Stat):
-    pass
+    __slots__ = ()
 
 
 class AttackDamage(Stat):
-    pass
+    __slots__ = ()
 
 
 class AbilityPower(Stat):
-    pass
+    __slots__ = ()
 
 
 class Movespeed(Stat):
-    pass
+    __slots__ = ()
 
 
 class CriticalStrikeChance(Stat):
-    pass
+    __slots__ = ()
 
 
 class AttackSpeed(Stat):
-    pass
+    __slots__ = ()
 
 
 class Lethality(Stat):
-    pass
+    __slots__ = ()
 
 
 class AttackRange(Stat):
-    pass
+    __slots__ = ()
 
 
 class CooldownReduction(Stat):
-    pass
+    __slots__ = ()
 
 
 class GoldPer10(Stat):
-    pass
+    __slots__ = ()
 
 
 class HealAndShieldPower(Stat):
-    pass
+    __slots__ = ()
 
 
 class Lifesteal(Stat):
-    pass
+    __slots__ = ()
 
 
 class MagicPenetration(Stat):
-    pass
+    __slots__ = ()
 
 
 class ArmorPenetration(Stat):
-    pass
+    __slots__ = ()
 
 
 class AbilityHaste(Stat):
-    pass
+    __slots__ = ()
 
 
 class OmniVamp(Stat):
-    pass
+    __slots__ = ()
 
 class Tenacity(Stat):
-    pass
\ No newline at end of file
+    __slots__ = ()
\ No newline at end of file
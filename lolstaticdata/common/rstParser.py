@@ -1,9 +1,17 @@
 # SHAMELESSLY TAKEN FROM https://github.com/CommunityDragon/CDTB/blob/master/cdragontoolbox/rstfile.py
 
+import os
+import sys
+import mmap
 import struct
+from array import array
+from typing import Dict, Iterable, List, Optional
+from collections.abc import Mapping
 from xxhash import xxh64_intdigest
 import requests
 
+from .utils import get_short_patch_version
+
 
 class BinaryParser:
     """Helper class to read from binary file object"""
@@ -38,27 +46,63 @@ class BinaryParser:
 
 def key_to_hash(key):
     if isinstance(key, str):
-        return xxh64_intdigest(key.lower()) & 0xffffffffff
+        return xxh64_intdigest(key.lower().encode("utf-8")) & 0xFFFFFFFFFF
     else:
         return key
 
 
+class LazyRstEntries(Mapping):
+    """The entries of an RST file, keyed by hash, that are only sliced out of the file and decoded when they are read.
+
+    `data` is the string table of the file (an mmap or bytes) and `offsets` maps each hash to the offset of its
+    null-terminated string in it.
+    """
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    def __getitem__(self, h):
+        i = self.offsets[h]
+        v = self.data[i : self.data.find(b"\0", i)]
+        # decode unless data starts with 0xFF (illegal UTF-8 sequence)
+        return v if v.startswith(b"\xff") else v.decode("utf-8")
+
+    def __contains__(self, h):
+        return h in self.offsets
+
+    def __iter__(self):
+        return iter(self.offsets)
+
+    def __len__(self):
+        return len(self.offsets)
+
+
 class RstFile:
-    def __init__(self, path_or_f=None):
+    """An RST string table.
+
+    With `lazy`, the file is memory-mapped (when it is a path, or when it is downloaded) and only the hash to offset
+    index is built up front; strings are decoded when they are looked up.
+    """
+
+    def __init__(self, path_or_f=None, lazy=False):
         self.font_config = None
         self.entries = {}
-
-        if path_or_f is not None:
-            if isinstance(path_or_f, str):
-                with open(path_or_f, "rb") as f:
+        self.lazy = lazy
+
+        if path_or_f is None:
+            # The English strings of the current patch, downloaded once into __cache__/rst/ like those of RstStrings
+            path_or_f = RstStrings(get_short_patch_version())._download("en_us")
+        if isinstance(path_or_f, str):
+            with open(path_or_f, "rb") as f:
+                if lazy:
+                    # The mapping stays valid after the file is closed
+                    self.parse_rst(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+                else:
                     self.parse_rst(f)
-            else:
-                self.parse_rst(path_or_f)
         else:
-            r = requests.get("http://raw.communitydragon.org/latest/game/data/menu/fontconfig_en_us.txt")
-            open(r"..\common\cdrag_rst.txt", "wb").write(r.content)
-            with open(r"..\common\cdrag_rst.txt", "rb") as f:
-                self.parse_rst(f)
+            self.parse_rst(path_or_f)
+
     def __getitem__(self, key):
         h = key_to_hash(key)
         try:
@@ -77,6 +121,7 @@ class RstFile:
             return default
 
     def parse_rst(self, f):
+        """Parse an RST file from a file object or from an mmap (which are read the same way)."""
         parser = BinaryParser(f)
 
         magic, version = parser.unpack("<3sB")
@@ -95,6 +140,22 @@ class RstFile:
             raise ValueError(f"unsupported RST version: {version}")
 
         count, = parser.unpack("<L")
+        if self.lazy:
+            # Read the whole entry table at once; each entry is a little-endian 64-bit offset (24 bits) and hash (40 bits)
+            table = array("Q")
+            table.frombytes(parser.raw(8 * count))
+            if sys.byteorder != "little":
+                table.byteswap()
+            parser.skip(1)  # 0 or 1
+            if isinstance(f, mmap.mmap):
+                # Zero-copy: the offsets point into the mapping instead of into a copy of the string table
+                data, base = f, parser.tell()
+            else:
+                data, base = parser.f.read(), 0
+            offsets = {v & 0xFFFFFFFFFF: base + (v >> 40) for v in table}
+            self.entries = LazyRstEntries(data, offsets)
+            return
+
         entries = []
         for _ in range(count):
             v, = parser.unpack("<Q")
@@ -105,4 +166,54 @@ class RstFile:
         data = parser.f.read()
         entries = [(h, data[i:data.find(b"\0", i)]) for i, h in entries]
         # decode unless data starts with 0xFF (illegal UTF-8 sequence)
-        self.entries = {h: v if v.startswith(b"\xff") else v.decode("utf-8") for h, v in entries}
\ No newline at end of file
+        self.entries = {h: v if v.startswith(b"\xff") else v.decode("utf-8") for h, v in entries}
+
+
+class RstStrings:
+    """The RST string tables of one patch in several locales.
+
+    Each locale's table is downloaded from CDragon the first time it is needed, kept in __cache__/rst/<patch>/ for
+    later runs, and memory-mapped (see `RstFile(lazy=True)`).
+    """
+
+    URL = "http://raw.communitydragon.org/{patch}/game/data/menu/fontconfig_{locale}.txt"
+
+    def __init__(self, patch: str, locales: Iterable[str] = ("en_us",)):
+        self.patch = patch
+        self.locales = list(locales)
+        self.directory = os.path.abspath(
+            os.path.join(os.path.dirname(os.path.realpath(__file__)), "../../__cache__/rst", patch)
+        )
+        self._files = {}
+
+    def __getitem__(self, locale: str) -> RstFile:
+        """The string table of `locale`, e.g. en_us."""
+        locale = locale.lower()
+        if locale not in self._files:
+            self._files[locale] = RstFile(self._download(locale), lazy=True)
+        return self._files[locale]
+
+    def _download(self, locale: str) -> str:
+        fn = os.path.join(self.directory, f"fontconfig_{locale}.txt")
+        if not os.path.exists(fn):
+            r = requests.get(self.URL.format(patch=self.patch, locale=locale))
+            r.raise_for_status()
+            os.makedirs(self.directory, exist_ok=True)
+            tmp = f"{fn}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(r.content)
+            os.replace(tmp, fn)
+        return fn
+
+    def resolve(self, keys: Iterable, locales: Iterable[str] = None) -> Dict[str, Dict[object, Optional[str]]]:
+        """Look up every key in every locale (all of this manager's locales by default).
+
+        Each key is hashed once, not once per locale. Returns {locale: {key: string or None}}.
+        """
+        keys = list(keys)
+        hashes: List[int] = [key_to_hash(key) for key in keys]
+        result = {}
+        for locale in self.locales if locales is None else locales:
+            entries = self[locale].entries
+            result[locale] = {key: entries.get(h) for key, h in zip(keys, hashes)}
+        return result
@@ -1,12 +1,20 @@
-from typing import Type, Collection, Mapping, Union
+from typing import Type, Callable, Collection, Iterable, Iterator, Mapping, Union
 import os
 import json
+import hashlib
+import dataclasses
 import requests
 import itertools
+import copy
+import fnmatch
+import tempfile
+from collections import OrderedDict, deque
+from concurrent.futures import Executor
 from bs4 import BeautifulSoup
 from enum import Enum
 from datetime import datetime
 from uuid import UUID
+from urllib.parse import unquote
 from decimal import Decimal
 from natsort import natsorted
 
@@ -52,6 +60,92 @@ class OrderedEnum(Enum):
         return NotImplemented
 
 
+class cached_classproperty:
+    """A property of a class (not of its instances) that is computed the first time it is read.
+
+    The value then replaces the descriptor on the class, so later reads are plain attribute lookups.
+    """
+
+    def __init__(self, func: Callable):
+        self.func = func
+        self.__doc__ = func.__doc__
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        value = self.func(owner)
+        setattr(owner, self.name, value)
+        return value
+
+
+def _hashable(value):
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return value  # Hashed by its own (structural) __hash__
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(v) for v in value)
+    if isinstance(value, Mapping):
+        return frozenset((k, _hashable(v)) for k, v in value.items())
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_hashable(v) for v in value)
+    return value
+
+
+def structural_hash(cls):
+    """Make a (mutable) dataclass hashable by value, consistently with the __eq__ that @dataclass generates.
+
+    Put it above @dataclass. The hash is computed from the field values the first time it is needed and then cached on
+    the instance. Setting a field drops the cached hash, but changing a nested model or list in place doesn't, and
+    either way an instance must not be changed after it has been put in a set or used as a dict key. The cached hash
+    is also left out when an instance is pickled or copied: string hashes differ between processes (e.g. for
+    champions built by worker processes), and a copy may be changed.
+    """
+
+    def __hash__(self):
+        h = getattr(self, "_structural_hash", None)
+        if h is None:
+            h = hash(tuple(_hashable(getattr(self, field.name)) for field in dataclasses.fields(self)))
+            object.__setattr__(self, "_structural_hash", h)
+        return h
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name != "_structural_hash":
+            object.__setattr__(self, "_structural_hash", None)
+
+    def __getstate__(self):
+        return {field.name: getattr(self, field.name) for field in dataclasses.fields(self)}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
+    cls.__hash__ = __hash__
+    cls.__setattr__ = __setattr__
+    cls.__getstate__ = __getstate__
+    cls.__setstate__ = __setstate__
+    return cls
+
+
+def slotted(cls):
+    """Recreate a dataclass with __slots__ for its fields, so that its instances don't each carry a __dict__.
+
+    Put it directly above @dataclass. A slot is also reserved for the hash that @structural_hash caches. Subclasses
+    must declare `__slots__ = ()` (or slots for their own fields) to stay compact.
+    """
+    names = tuple(field.name for field in dataclasses.fields(cls))
+    namespace = dict(cls.__dict__)
+    for name in names:
+        # @dataclass leaves the default values as class attributes, which would shadow the slots
+        namespace.pop(name, None)
+    namespace.pop("__dict__", None)
+    namespace.pop("__weakref__", None)
+    inherited = {slot for base in cls.__mro__[1:] for slot in getattr(base, "__slots__", ())}
+    namespace["__slots__"] = tuple(name for name in names + ("_structural_hash",) if name not in inherited)
+    namespace["__qualname__"] = cls.__qualname__
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+
 # From dataclasses_json -> utils.py
 def _isinstance_safe(o, t):
     try:
@@ -84,6 +178,63 @@ class ExtendedEncoder(json.JSONEncoder):
         return result
 
 
+class DataclassSerializer:
+    """Converts (dataclasses_json) dataclasses to the same json-ready dicts as `to_dict()`, but faster.
+
+    A serializer function is generated once per class, with the field names already converted to their json keys
+    (e.g. camelCase), instead of reflecting over the class's fields and overrides for every instance. Enums are
+    converted to their values directly rather than by ExtendedEncoder. `exclude` maps base classes to the names of
+    fields that are left out for those classes and their subclasses.
+    """
+
+    _scalars = (str, int, float, bool, type(None))
+
+    def __init__(self, exclude: Mapping[type, Collection[str]] = None):
+        self.exclude = exclude or {}
+        self._serializers = {}
+
+    def __call__(self, value) -> Json:
+        serializer = self._serializers.get(type(value))
+        if serializer is not None:
+            return serializer(value, self)
+        if isinstance(value, self._scalars):
+            return value
+        if isinstance(value, Enum):
+            return value.value
+        if dataclasses.is_dataclass(value) and not isinstance(value, type):
+            serializer = self._serializers[type(value)] = self._compile(type(value))
+            return serializer(value, self)
+        if isinstance(value, Mapping):
+            return {self(k): self(v) for k, v in value.items()}
+        if isinstance(value, Collection) and not isinstance(value, (str, bytes)):
+            return [self(v) for v in value]
+        return copy.deepcopy(value)
+
+    def _compile(self, cls: type) -> Callable:
+        excluded = set()
+        for base, names in self.exclude.items():
+            if issubclass(cls, base):
+                excluded.update(names)
+        class_config = getattr(cls, "dataclass_json_config", None) or {}
+        items = []
+        for field in dataclasses.fields(cls):
+            config = dict(class_config, **field.metadata.get("dataclasses_json", {}))
+            if config.get("encoder") is not None or config.get("exclude") is not None:
+                # Field overrides aren't supported, use dataclasses_json for the whole class
+                return lambda value, serializer: serializer(value.to_dict())
+            if field.name in excluded:
+                continue
+            letter_case = config.get("letter_case")
+            key = letter_case(field.name) if letter_case is not None else field.name
+            items.append(f"{key!r}: serializer(value.{field.name})")
+        namespace = {}
+        exec(f"def serialize(value, serializer):\n    return {{{', '.join(items)}}}", namespace)
+        return namespace["serialize"]
+
+
+to_json_dict = DataclassSerializer()
+
+
 def grouper(iterable, n, fillvalue=None):
     """Collect champData into fixed-length chunks or blocks"""
     # grouper('ABCDEFG', 3, 'x') --> ABC DEF Gxx"
@@ -91,6 +242,21 @@ def grouper(iterable, n, fillvalue=None):
     return itertools.zip_longest(*args, fillvalue=fillvalue)
 
 
+def map_bounded(executor: Executor, fn: Callable, iterable: Iterable, window: int) -> Iterator:
+    """Like executor.map, but with at most `window` calls submitted and not yet consumed at any time.
+
+    executor.map submits everything up front, so the results that finish early pile up in memory while they wait for
+    an earlier, slower one.
+    """
+    pending = deque()
+    for item in iterable:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
 def parenthetic_contents(string):
     # http://stackoverflow.com/questions/4284991/parsing-nested-parentheses-in-python-grab-content-by-level
     """Generate parenthesized contents in string as pairs (level, contents)."""
@@ -137,7 +303,8 @@ def download_json(url: str, use_cache: bool = True) -> Json:
     return j
 
 
-def download_soup(url: str, use_cache: bool = True, dir: str = f"__cache__"):
+def cache_filename(url: str, dir: str = f"__cache__") -> str:
+    """The file that download_soup caches the page at `url` in."""
     directory = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), "../.."))
     directory = os.path.join(directory, dir)
     if "ITEM_DATA" not in url.upper():
@@ -147,6 +314,16 @@ def download_soup(url: str, use_cache: bool = True, dir: str = f"__cache__"):
         if url_split == "'Your_Cut":
             url_split.replace("'", "")
         fn = os.path.join(directory, url_split.replace("/", "@"))
+    return fn
+
+
+def wiki_page_title(url: str) -> str:
+    """The title of the wiki page at `url`, e.g. "Template:Item data 'Your Cut'"."""
+    return unquote(url.split("/wiki/", 1)[1]).replace("_", " ")
+
+
+def download_soup(url: str, use_cache: bool = True, dir: str = f"__cache__"):
+    fn = cache_filename(url, dir)
     if use_cache and os.path.exists(fn):
         with open(fn, encoding="utf-8") as f:
             html = f.read()
@@ -174,6 +351,108 @@ def download_soup(url: str, use_cache: bool = True, dir: str = f"__cache__"):
     return html
 
 
+def content_hash(content: Union[str, bytes, Json]) -> str:
+    """Hash raw page content (or any json-serializable data) to a stable hex digest."""
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    elif not isinstance(content, bytes):
+        try:
+            content = json.dumps(content, sort_keys=True, ensure_ascii=False, default=str)
+        except TypeError:  # Decoded lua tables can mix int and str keys, which can't be sorted
+            content = json.dumps(content, ensure_ascii=False, default=str)
+        content = content.encode("utf-8")
+    return hashlib.sha1(content).hexdigest()
+
+
+def cached_parse(namespace: str, key: str, html: str, parse: Callable[[str], Json]) -> Json:
+    """Return `parse(html)`, reusing the result stored by a previous run if the page `key` (e.g. its url) didn't change.
+
+    Each page has a single file in __cache__/__parsed__/<namespace>/, which records the content hash of the page it was
+    parsed from and is replaced when the page changes, so the cache doesn't grow with every edit of the wiki. Bump the
+    version in `namespace` whenever the output of `parse` changes.
+    """
+    directory = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), "../.."))
+    directory = os.path.join(directory, "__cache__", "__parsed__", namespace)
+    fn = os.path.join(directory, content_hash(key) + ".json")
+    page_hash = content_hash(html)
+    if os.path.exists(fn):
+        with open(fn, encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached["hash"] == page_hash:
+            return cached["result"]
+    result = parse(html)
+    os.makedirs(directory, exist_ok=True)
+    # Pages are parsed on several threads, which may parse the same page at the same time
+    fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=directory)
+    with open(fd, "w", encoding="utf-8") as f:
+        json.dump({"hash": page_hash, "result": result}, f, ensure_ascii=False)
+    os.replace(tmp, fn)
+    return result
+
+
+def read_template_table(soup: BeautifulSoup) -> "OrderedDict[str, str]":
+    """Read a wiki template's parameter table into an ordered {parameter: value} dict.
+
+    Every value cell has a "data-name" attribute and its parameter name is in the cell right before it, so a single
+    forward pass over the cells pairs them up.
+    """
+    data = OrderedDict()
+    previous = None
+    for td in soup.find_all("td"):
+        if previous is not None and td.has_attr("data-name"):
+            data[previous.text.strip()] = td.text.strip()
+        previous = td
+    return data
+
+
+def matches_selection(patterns: Collection[str], *names) -> bool:
+    """Whether any of the names (e.g. a key, a name and an id) matches any of the case-insensitive glob patterns."""
+    names = [str(name).lower() for name in names if name is not None]
+    return any(fnmatch.fnmatchcase(name, pattern.lower()) for pattern in patterns for name in names)
+
+
+class JsonObjectWriter:
+    """Writes a JSON object to `filename` one member at a time, so that the whole object never has to be in memory.
+
+    The output is the same as json.dump(obj, f, indent=indent, ensure_ascii=False). It is written to a temporary file
+    that only replaces `filename` when the `with` block exits without an exception.
+    """
+
+    def __init__(self, filename: str, indent: int = 2):
+        self.filename = filename
+        self.indent = " " * indent
+        self._tmp = f"{filename}.{os.getpid()}.tmp"
+        self._file = None
+        self._count = 0
+
+    def __enter__(self) -> "JsonObjectWriter":
+        self._file = open(self._tmp, "w", encoding="utf8")
+        self._count = 0
+        return self
+
+    def write(self, key, value: Json):
+        self.write_encoded(key, json.dumps(value, indent=len(self.indent), ensure_ascii=False))
+
+    def write_encoded(self, key, encoded: str):
+        """Write a member whose value is already encoded, with the same indent and ensure_ascii=False."""
+        self._file.write("{\n" if self._count == 0 else ",\n")
+        self._file.write(f"{self.indent}{json.dumps(str(key), ensure_ascii=False)}: ")
+        # JSON strings can't contain raw newlines, so every newline starts a line that has to be indented one more level
+        self._file.write(encoded.replace("\n", "\n" + self.indent))
+        self._count += 1
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self._file.write("{}" if self._count == 0 else "\n}")
+        finally:
+            self._file.close()
+        if exc_type is None:
+            os.replace(self._tmp, self.filename)
+        else:
+            os.remove(self._tmp)
+
+
 def save_json(data, filename):
     def set_default(obj):
         if isinstance(obj, set):
@@ -194,8 +473,37 @@ def save_json(data, filename):
         of.write(sdata)
 
 
-def get_latest_patch_version():
-    versions = download_json("http://ddragon.leagueoflegends.com/api/versions.json", use_cache=False)
-    versions = [v for v in versions if "_" not in v]
-    versions = natsorted(versions)
-    return versions[-1]
+# Setting this environment variable to a DDragon version (e.g. 11.2.1) pins the patch that is built
+PATCH_VERSION_ENV = "LOLSTATICDATA_PATCH"
+_patch_version = None
+
+
+def set_patch_version(version: str):
+    """Pin the patch version for the rest of the run (and for the worker processes it starts) instead of looking up
+    the latest one, e.g. for reproducible or offline builds."""
+    global _patch_version
+    _patch_version = version
+    os.environ[PATCH_VERSION_ENV] = version
+
+
+def get_latest_patch_version() -> str:
+    """The DDragon version of the patch that is built, e.g. 11.2.1.
+
+    Unless a version is pinned, DDragon's version list is downloaded the first time and the result is reused for the
+    rest of the run.
+    """
+    global _patch_version
+    if _patch_version is None:
+        if os.environ.get(PATCH_VERSION_ENV):
+            _patch_version = os.environ[PATCH_VERSION_ENV]
+        else:
+            versions = download_json("http://ddragon.leagueoflegends.com/api/versions.json", use_cache=False)
+            versions = [v for v in versions if "_" not in v]
+            versions = natsorted(versions)
+            _patch_version = versions[-1]
+    return _patch_version
+
+
+def get_short_patch_version() -> str:
+    """The patch version in the "major.minor" form that CDragon uses, e.g. 11.2 for DDragon's 11.2.1."""
+    return ".".join(get_latest_patch_version().split(".")[:2])
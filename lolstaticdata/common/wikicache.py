@@ -0,0 +1,125 @@
+from typing import Dict, Iterable, List, Optional
+import os
+import json
+import shutil
+import requests
+
+from .utils import cache_filename, wiki_page_title
+
+
+class WikiCache:
+    """A persistent cache of wiki pages that download_soup stores in `dir`, revalidated against the wiki.
+
+    The MediaWiki API reports when each page was last "touched", which changes when the page is edited and also when
+    a template it uses changes. The timestamp is recorded for every cached page, and a page is evicted from the cache
+    when its timestamp changes, so that download_soup downloads it again. Up to 50 pages are checked per request.
+    """
+
+    API_URL = "https://leagueoflegends.fandom.com/api.php"
+    BATCH_SIZE = 50
+    TIMEOUT = 30
+
+    def __init__(self, dir: str = "__wiki__"):
+        self.dir = dir
+        self.directory = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), "../..", dir))
+        self.filename = os.path.join(self.directory, ".touched.json")
+
+    def clear(self):
+        """Delete every cached page."""
+        if os.path.exists(self.directory):
+            shutil.rmtree(self.directory)
+
+    def revalidate(self, urls: Iterable[str]):
+        """Evict the cached pages that changed on the wiki since they were cached.
+
+        `urls` are the pages that are about to be used. Every page that is already in the cache is checked as well, and
+        cached files that the cache knows nothing about are evicted.
+        """
+        if not os.path.exists(self.directory):
+            os.mkdir(self.directory)
+        touched = self._load()
+        urls = list(dict.fromkeys(list(touched) + list(urls)))
+        latest = {}
+        unchecked = set()
+        for i in range(0, len(urls), self.BATCH_SIZE):
+            batch = urls[i : i + self.BATCH_SIZE]
+            batch_touched = self._get_touched(batch)
+            if batch_touched is None:
+                unchecked.update(batch)
+            else:
+                latest.update(batch_touched)
+
+        known = {}
+        for url in urls:
+            fn = cache_filename(url, self.dir)
+            if url in unchecked:
+                # The wiki couldn't be asked about these pages, they are kept as they are until the next run
+                known[os.path.basename(fn)] = url
+                continue
+            if touched.get(url) != latest.get(url) and os.path.exists(fn):
+                print(f"{url} changed, downloading it again")
+                os.remove(fn)
+            if latest.get(url) is not None:
+                touched[url] = latest[url]
+                known[os.path.basename(fn)] = url
+            else:
+                # Missing pages can't be revalidated, so they are never kept in the cache
+                touched.pop(url, None)
+        for fn in os.listdir(self.directory):
+            if fn not in known and fn != os.path.basename(self.filename):
+                os.remove(os.path.join(self.directory, fn))
+        self._save(touched)
+
+    def record(self, urls: Iterable[str]):
+        """Start revalidating pages that were cached after `revalidate`, e.g. templates found while parsing the others.
+
+        Otherwise the next run would evict them as unknown files and download them again.
+        """
+        touched = self._load()
+        urls = [url for url in dict.fromkeys(urls) if url not in touched]
+        for i in range(0, len(urls), self.BATCH_SIZE):
+            touched.update(self._get_touched(urls[i : i + self.BATCH_SIZE]) or {})
+        self._save(touched)
+
+    def _get_touched(self, urls: List[str]) -> Optional[Dict[str, str]]:
+        """When each of the pages at `urls` was last touched, or None if the API couldn't be asked."""
+        titles = {wiki_page_title(url): url for url in urls}
+        try:
+            response = requests.get(
+                self.API_URL,
+                params={
+                    "action": "query",
+                    "prop": "info",
+                    "titles": "|".join(titles),
+                    "redirects": 1,
+                    "format": "json",
+                },
+                timeout=self.TIMEOUT,
+            )
+            response.raise_for_status()
+            query = response.json()["query"]
+        except (requests.RequestException, ValueError, KeyError) as error:
+            print(f"WARNING: Could not check whether {len(urls)} cached wiki pages changed: {error!r}")
+            return None
+        # The API answers with normalized titles (e.g. with a capitalized first letter) and with the targets of redirects
+        for renamed in query.get("normalized", []) + query.get("redirects", []):
+            if renamed["from"] in titles:
+                titles[renamed["to"]] = titles.pop(renamed["from"])
+        return {
+            titles[page["title"]]: page["touched"]
+            for page in query["pages"].values()
+            if "touched" in page and page["title"] in titles
+        }
+
+    def _load(self) -> Dict[str, str]:
+        if os.path.exists(self.filename):
+            with open(self.filename, encoding="utf-8") as f:
+                return json.load(f)
+        return {}
+
+    def _save(self, touched: Dict[str, str]):
+        # Replace the file in one step, an interrupted run mustn't leave a truncated file behind
+        tmp = f"{self.filename}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(touched, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.filename)
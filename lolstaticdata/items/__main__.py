@@ -1,13 +1,25 @@
+from typing import Dict, List, Optional, Tuple
 import os
-import shutil
-import json
-
+import argparse
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+from ..common.utils import (
+    PATCH_VERSION_ENV,
+    JsonObjectWriter,
+    content_hash,
+    map_bounded,
+    matches_selection,
+    set_patch_version,
+)
+from ..common.buildgraph import BuildGraph
+from ..common.wikicache import WikiCache
 from .pull_items_wiki import WikiItem, get_item_urls
 from .pull_items_dragon import DragonItem
-from collections import OrderedDict
+from .modelitem import Item
 
 
-def _name_to_wiki(name: str):  # Change item name for wiki url
+def _name_to_wiki_url(name: str) -> str:  # Change item name for wiki url
     url = "https://leagueoflegends.fandom.com/wiki/Template:Item_data_"
     name = name.replace(" ", "_")
     if "Enchantment:" in name:
@@ -27,98 +39,214 @@ def _name_to_wiki(name: str):  # Change item name for wiki url
 
     if wikiUrl == "https://leagueoflegends.fandom.com/wiki/Template:Item_data_Your_Cut":
         wikiUrl = "https://leagueoflegends.fandom.com/wiki/Template:Item_data_%27Your_Cut%27"
-    print(wikiUrl)
-    wiki_item = WikiItem.get(wikiUrl)
-    return wiki_item
+    return wikiUrl
 
 
-def rewrite():
+def _index_cdragon_items(cdragon: List[dict]) -> Dict[str, List[dict]]:
+    """Clean up the names of the CDragon items and group the items by their upper-cased name, in CDragon's order."""
+    index = {}
+    for i in cdragon:
+        i["name"] = i["name"].replace("%i:ornnIcon% ", "")
+        i["name"] = i["name"].replace("<rarityLegendary>", "")
+        if "</rarityLegendary>" in i["name"]:
+            i["name"] = i["name"].split("</rarityLegendary>")[0]
+        index.setdefault(i["name"].upper(), []).append(i)
+    return index
+
+
+def render_item(cdragon_item: dict, item_data: Dict[str, str], item_ids: Dict[str, Optional[int]]) -> Item:
+    """Parse the wiki template data of an item and merge the CDragon item into it."""
+    cdrag_item = DragonItem.get_item_cdragon(cdragon_item)
+    wiki_item = WikiItem.from_item_data(item_data, item_ids)
+    item = wiki_item
+    item.icon = cdrag_item.icon
+    item.id = int(cdrag_item.id)
+    item.builds_from = cdrag_item.builds_from
+    item.builds_into = cdrag_item.builds_into
+    item.simple_description = cdrag_item.simple_description
+    item.required_ally = cdrag_item.required_ally
+    item.required_champion = cdrag_item.required_champion
+    item.shop.purchasable = cdrag_item.shop.purchasable
+    item.special_recipe = cdrag_item.special_recipe
+    if item.iconOverlay == True:
+        item.iconOverlay = "http://raw.communitydragon.org/10.24/game/data/items/icons2d/bordertreatmentornn.png"
+    else:
+        item.iconOverlay = False
+    return item
+
+
+def encode_item(cdragon_item: dict, item_data: Dict[str, str], item_ids: Dict[str, Optional[int]]) -> str:
+    """Render the item and encode it, e.g. in a worker process, so that only the json text is sent back."""
+    return render_item(cdragon_item, item_data, item_ids).__json__(indent=2, ensure_ascii=False)
+
+
+def _encode_item_job(job: Tuple[dict, Dict[str, str]], item_ids: Dict[str, Optional[int]]) -> str:
+    cdragon_item, item_data = job
+    return encode_item(cdragon_item, item_data, item_ids)
+
+
+def rewrite(
+    force: bool = False, selection: List[str] = None, clear_cache: bool = False, jobs: int = 1, prefetch: bool = False
+):
+    """Build the items, or only those whose name or id matches one of the glob patterns in `selection`.
+
+    With `jobs` > 1 the templates are downloaded and the items are rendered in that many worker processes. With
+    `prefetch` the templates that aren't cached are downloaded in batches through the wiki's parse API.
+    """
     directory = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), "../.."))
+    graph = BuildGraph("items", directory)
     use_cache = False
     if not os.path.exists(os.path.join(directory, "items")):
         os.mkdir(os.path.join(directory, "items"))
 
-    if os.path.exists(os.path.join(directory, "__wiki__")):
-        shutil.rmtree(os.path.join(directory, "__wiki__"))
-
-    if not os.path.exists(os.path.join(directory, "__wiki__")):
-        os.mkdir(os.path.join(directory, "__wiki__"))
+    wiki_cache = WikiCache("__wiki__")
+    if clear_cache:
+        wiki_cache.clear()
     # ddragon = DragonItem.get_json_ddragon()
     cdragon = DragonItem.get_cdragon()
     wikiItems = get_item_urls(False)
 
     # print(wikiItems)
 
-    for i in cdragon:
-        i["name"] = i["name"].replace("%i:ornnIcon% ", "")
-        i["name"] = i["name"].replace("<rarityLegendary>", "")
-        if "</rarityLegendary>" in i["name"]:
-            i["name"] = i["name"].split("</rarityLegendary>")[0]
-    jsons = {}
-    for x in wikiItems:
-        if x in ["goose", "goose1"]:
-            continue
+    cdragon_by_name = _index_cdragon_items(cdragon)
+    # dict.fromkeys drops repeated names (keeping their order) so that each wiki template is only fetched once
+    wiki_urls = {x: _name_to_wiki_url(x) for x in dict.fromkeys(wikiItems) if x not in ["goose", "goose1"]}
+    # The templates are kept between runs, only the ones that changed on the wiki are downloaded again
+    wiki_cache.revalidate(wiki_urls.values())
+    # The ids of the items that go in items.json, which is assembled from the per-item files at the end
+    rebuilt = set()
+    kept = set()
+    # The template url and matching CDragon items of each wiki item
+    matched = []
+    for x in wiki_urls:
+        item = None
+        print(x)
+        # try:
+        #     cdragon_item = DragonItem.get_item_cdragon(d, ddragon)
+        # except ValueError:
+        #     continue
+        if x == "'Your Cut'":
+            l = cdragon_by_name.get("YOUR CUT", [])
+        elif x == "Slightly Magical Boots":
+            l = cdragon_by_name.get(x.upper()) or cdragon_by_name.get("SLIGHTLY MAGICAL FOOTWEAR", [])
         else:
-            item = None
-            print(x)
-            # try:
-            #     cdragon_item = DragonItem.get_item_cdragon(d, ddragon)
-            # except ValueError:
-            #     continue
-            if x == "'Your Cut'":
-                x = "Your Cut"
-                # l = [d for d in cdragon if x.upper() == d["name"].upper()]
-                l = list(filter(lambda d: d["name"].upper() == x.upper(), cdragon))
-                x = "'Your Cut'"
-            elif x == "Slightly Magical Boots":
-                if list(filter(lambda d: d["name"].upper() == x.upper(), cdragon)):
-                    l = list(filter(lambda d: d["name"].upper() == x.upper(), cdragon))
+            l = cdragon_by_name.get(x.upper(), [])
+
+        if selection:
+            # Items that aren't selected keep what was built last time
+            kept.update(
+                int(i["id"])
+                for i in l
+                if not matches_selection(selection, x, i["name"], int(i["id"]))
+                and os.path.exists(os.path.join(directory, "items", str(int(i["id"])) + ".json"))
+            )
+            l = [i for i in l if matches_selection(selection, x, i["name"], int(i["id"]))]
+        if len(l) >= 1:
+            matched.append((wiki_urls[x], l))
+
+    if jobs > 1:
+        executor = ProcessPoolExecutor(max_workers=jobs)
+        # Only a few items are submitted ahead of the one being written, so the encoded items don't pile up in memory
+        map_items = partial(map_bounded, executor, window=2 * jobs)
+    else:
+        executor = None
+        map_items = map
+    try:
+        urls = [url for url, _ in matched]
+        if prefetch:
+            # Most templates are downloaded a batch at a time, the rest one page at a time by get_item_data
+            WikiItem.prefetch_item_data(urls)
+        item_data_by_url = dict(zip(urls, map_items(WikiItem.get_item_data, urls)))
+        # Every template is downloaded by now, so the components and upgrades of the items can be resolved to ids
+        # without downloading their templates again
+        item_ids = WikiItem.get_item_ids(item_data_by_url)
+        # The components and upgrades that don't have templates of their own among the items are resolved here too,
+        # once, rather than by each worker, and kept in the wiki cache for the next run
+        component_urls = [url for url in WikiItem.get_component_urls(item_data_by_url.values()) if url not in item_ids]
+        if prefetch:
+            WikiItem.prefetch_item_data(component_urls)
+        item_ids.update(
+            WikiItem.get_item_ids(dict(zip(component_urls, map_items(WikiItem.get_item_data, component_urls))))
+        )
+        wiki_cache.record(component_urls)
+
+        render = []
+        for url, l in matched:
+            item_data = item_data_by_url[url]
+            for i in l:
+                output = os.path.join("items", str(int(i["id"])) + ".json")
+                inputs = {
+                    "wiki": content_hash(item_data),
+                    "cdragon": content_hash(i),
+                    "patch": DragonItem.latest_version,
+                }
+                if not force and graph.is_fresh(output, inputs):
+                    # Nothing changed, reuse what was built last time
+                    rebuilt.add(int(i["id"]))
                 else:
-                    x = "Slightly Magical Footwear"
-                    # l = [d for d in cdragon if x.upper() == d["name"].upper()]
-                    l = list(filter(lambda d: d["name"].upper() == x.upper(), cdragon))
-                    x = "Slightly Magical Boots"
-            else:
-                # l = [d for d in cdragon if x.upper() == d["name"].upper()]
-                l = list(filter(lambda d: d["name"].upper() == x.upper(), cdragon))
-
-            if len(l) >= 1:
-                for i in l:
-
-                    cdrag_item = DragonItem.get_item_cdragon(i)
-                    wiki_item = _name_to_wiki(x)
-                    item = wiki_item
-                    item.icon = cdrag_item.icon
-                    item.id = int(cdrag_item.id)
-                    item.builds_from = cdrag_item.builds_from
-                    item.builds_into = cdrag_item.builds_into
-                    item.simple_description = cdrag_item.simple_description
-                    item.required_ally = cdrag_item.required_ally
-                    item.required_champion = cdrag_item.required_champion
-                    item.shop.purchasable = cdrag_item.shop.purchasable
-                    item.special_recipe = cdrag_item.special_recipe
-                    if item.iconOverlay == True:
-                        item.iconOverlay = (
-                            "http://raw.communitydragon.org/10.24/game/data/items/icons2d/bordertreatmentornn.png"
-                        )
-                    else:
-                        item.iconOverlay = False
-                    if item is not None:
-                        jsonfn = os.path.join(directory, "items", str(item.id) + ".json")
-                        with open(jsonfn, "w", encoding="utf8") as f:
-                            j = item.__json__(indent=2, ensure_ascii=False)
-                            f.write(j)
-                        jsons[int(item.id)] = json.loads(item.__json__(ensure_ascii=False))
-                        print(item.id)
-    if os.path.exists(os.path.join(directory, "__wiki__")):
-        shutil.rmtree(os.path.join(directory, "__wiki__"))
-    jsonfn = os.path.join(directory, "items.json")
-    jsons = OrderedDict(sorted(jsons.items(), key=lambda x: x[1]["id"]))
-    with open(jsonfn, "w", encoding="utf8") as f:
-        json.dump(jsons, f, indent=2, ensure_ascii=False)
-    del jsons
+                    render.append((i, item_data, output, inputs))
+
+        # The items are written in the order of `render` whichever worker finishes first, and items.json is sorted
+        # by id, so the output doesn't depend on the number of workers
+        encoded = map_items(partial(_encode_item_job, item_ids=item_ids), [(i, d) for i, d, *_ in render])
+        for (i, _, output, inputs), j in zip(render, encoded):
+            with open(os.path.join(directory, output), "w", encoding="utf8") as f:
+                f.write(j)
+            rebuilt.add(int(i["id"]))
+            graph.record(output, inputs)
+            print(int(i["id"]))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    graph.save()
+    if selection and not rebuilt:
+        print(f"No items match {' '.join(selection)}")
+        return
+    # Stream the aggregate in id order, one item at a time
+    with JsonObjectWriter(os.path.join(directory, "items.json")) as aggregate:
+        for id in sorted(rebuilt | kept):
+            with open(os.path.join(directory, "items", str(id) + ".json"), encoding="utf8") as f:
+                aggregate.write_encoded(id, f.read())
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(prog="python -m lolstaticdata.items")
+    parser.add_argument(
+        "items",
+        nargs="*",
+        help="only build the items whose name or id matches one of these (glob) patterns, e.g. 3031 or 'Infinity*', "
+        "and patch them into the existing items.json (default: build every item)",
+    )
+    parser.add_argument(
+        "--jobs", "-j", type=int, default=1, help="number of worker processes used to render items (default: 1)"
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="rebuild every item, even those whose inputs didn't change"
+    )
+    parser.add_argument(
+        "--clear-cache",
+        action="store_true",
+        help="delete the cached wiki templates first, so that all of them are downloaded again",
+    )
+    parser.add_argument(
+        "--patch",
+        help=f"build this DDragon patch version (e.g. 11.2.1) instead of the latest one; the {PATCH_VERSION_ENV} "
+        "environment variable does the same",
+    )
+    parser.add_argument(
+        "--prefetch",
+        action="store_true",
+        help="download the wiki item templates that aren't cached in batches through the wiki's parse API, instead of "
+        "one page at a time (experimental)",
+    )
+    args = parser.parse_args(argv)
+    if args.patch:
+        set_patch_version(args.patch)
+    rewrite(
+        force=args.force, selection=args.items, clear_cache=args.clear_cache, jobs=args.jobs, prefetch=args.prefetch
+    )
 
 
 if __name__ == "__main__":
-    rewrite()
+    main()
     print("Hello! What a surprise, it worked! Remember, diamond hands!")
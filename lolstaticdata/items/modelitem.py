@@ -4,7 +4,7 @@ import dataclasses_json
 import json
 import stringcase
 
-from ..common.utils import OrderedEnum, ExtendedEncoder
+from ..common.utils import OrderedEnum, ExtendedEncoder, structural_hash, slotted, to_json_dict
 from ..common.modelcommon import (
     ArmorPenetration,
     DamageType,
@@ -82,6 +82,8 @@ class ItemRanks(OrderedEnum):
 
 
 @dataclasses_json.dataclass_json(letter_case=dataclasses_json.LetterCase.CAMEL)
+@structural_hash
+@slotted
 @dataclass
 class Stats(object):
     ability_power: AbilityPower
@@ -108,6 +110,8 @@ class Stats(object):
 
 
 @dataclasses_json.dataclass_json(letter_case=dataclasses_json.LetterCase.CAMEL)
+@structural_hash
+@slotted
 @dataclass
 class Prices(object):
     total: int
@@ -116,6 +120,8 @@ class Prices(object):
 
 
 @dataclasses_json.dataclass_json(letter_case=dataclasses_json.LetterCase.CAMEL)
+@structural_hash
+@slotted
 @dataclass
 class Shop(object):
     prices: Prices
@@ -124,6 +130,8 @@ class Shop(object):
 
 
 @dataclasses_json.dataclass_json(letter_case=dataclasses_json.LetterCase.CAMEL)
+@structural_hash
+@slotted
 @dataclass
 class Passive(object):
     unique: bool
@@ -135,6 +143,8 @@ class Passive(object):
 
 
 @dataclasses_json.dataclass_json(letter_case=dataclasses_json.LetterCase.CAMEL)
+@structural_hash
+@slotted
 @dataclass
 class Active(object):
     unique: bool
@@ -145,6 +155,8 @@ class Active(object):
 
 
 @dataclasses_json.dataclass_json(letter_case=dataclasses_json.LetterCase.CAMEL)
+@structural_hash
+@slotted
 @dataclass
 class Item(object):
     name: str
@@ -168,7 +180,7 @@ class Item(object):
     iconOverlay: str
 
     def __json__(self, *args, **kwargs):
-        # Use dataclasses_json to get the dict
-        d = self.to_dict()
+        # Get the same dict as dataclasses_json's to_dict
+        d = to_json_dict(self)
         # Return the (un)modified dict
         return json.dumps(d, cls=ExtendedEncoder, *args, **kwargs)
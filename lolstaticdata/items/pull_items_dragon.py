@@ -1,23 +1,40 @@
+from typing import Optional
 import json
 import os
+import requests
 
-from ..common.utils import download_json
+from ..common.utils import download_json, cached_classproperty, get_latest_patch_version, get_short_patch_version
 from .pull_items_wiki import WikiItem
 from .modelitem import Item, Shop
-from ..common.rstParser import RstFile
+from ..common.rstParser import RstFile, RstStrings
 
 
 def get_latest_version():
-    url = "http://ddragon.leagueoflegends.com/api/versions.json"
-    j = download_json(url, use_cache=False)
-    return j[0]
+    return get_latest_patch_version()
 
 
 class DragonItem:
-    latest_version = get_latest_version()
-    version = latest_version.split(".")
-    version = str(version[0]) + "." + str(version[1])
-    rst = RstFile()
+    # These are only downloaded when they are first used, not when the module is imported
+    @cached_classproperty
+    def latest_version(cls) -> str:
+        return get_latest_version()
+
+    @cached_classproperty
+    def version(cls) -> str:
+        return get_short_patch_version()
+
+    @cached_classproperty
+    def strings(cls) -> RstStrings:
+        return RstStrings(cls.version)
+
+    @cached_classproperty
+    def rst(cls) -> Optional[RstFile]:
+        """The English strings of the patch, or None if they couldn't be downloaded (which is only tried once)."""
+        try:
+            return cls.strings["en_us"]
+        except requests.RequestException as error:
+            print(f"WARNING: Could not download the strings of patch {cls.version}, items have no plaintext: {error}")
+            return None
 
     @staticmethod
     def get_cdragon():  # cdragon to list
@@ -49,10 +66,7 @@ class DragonItem:
         purchasable = cdrag["inStore"]
         cdragid = cdrag["id"]
         icon = cdrag["iconPath"]
-        try:
-            plaintext = cls.rst.get_item_plaintext(cdragid)
-        except:
-            plaintext = None
+        plaintext = cls.rst.get(f"game_item_plaintext_{cdragid}") if cls.rst is not None else None
         shop = Shop(purchasable=purchasable, prices=[], tags=[])
         item = Item(
             builds_from=builds_from,
@@ -100,14 +114,14 @@ class DragonItem:
         cls,
     ):  # Main Function, gets items from ddragon, compares them with cdragon and then gets the items from the wiki
         # I didn't want make a request to cdragon for every item
-        url = "http://ddragon.leagueoflegends.com/cdn/{}/data/en_US/item.json".format(get_latest_version())
+        url = "http://ddragon.leagueoflegends.com/cdn/{}/data/en_US/item.json".format(cls.latest_version)
         p = download_json(url, use_cache=True)
         return p["data"]
 
     @classmethod
     def get_ddragon(cls, ddragon: int, p: dict):
         # print(ddragon)
-        baseurl = "http://ddragon.leagueoflegends.com/cdn/{}/img/item/".format(get_latest_version())  # icon base url
+        baseurl = "http://ddragon.leagueoflegends.com/cdn/{}/img/item/".format(cls.latest_version)  # icon base url
         icon = baseurl + p[ddragon]["image"]["full"]
         plaintext = p[ddragon]["plaintext"]  # simple description
         purchasable = p[ddragon]["gold"]["purchasable"]  # is this purchasable or is it upgraded (seraph's embrace)
@@ -1,7 +1,8 @@
-from typing import List, Optional, Tuple
+from typing import Dict, Iterable, List, Match, Optional, Tuple
 from bs4 import BeautifulSoup
+import os
 import re
-from collections import OrderedDict
+import requests
 
 from .modelitem import (
     Stats,
@@ -13,7 +14,8 @@ from .modelitem import (
     ItemAttributes,
     ItemRanks,
 )
-from ..common.utils import download_soup
+from ..common.utils import download_soup, read_template_table, cached_parse, cache_filename, wiki_page_title
+from ..common.wikicache import WikiCache
 from ..common.modelcommon import (
     ArmorPenetration,
     DamageType,
@@ -41,18 +43,90 @@ from ..common.modelcommon import (
 )
 
 
+class PassiveStatScanner:
+    """Precompiled patterns for the stats that appear in item passive and active descriptions.
+
+    One case-insensitive pass over the text finds which stat keywords are present, then only the patterns for those
+    stats are searched, each at most once. A single alternation can't replace the individual patterns because several
+    of them are greedy and would swallow the matches of the others.
+    """
+
+    patterns = {
+        "cooldown_reduction": re.compile(r"\d.* cooldown reduction"),
+        "critical_strike_chance": re.compile(r"\d.* critical strike chance"),
+        "lethality": re.compile(r"(\d.*) (?:lethality|Lethality)", re.IGNORECASE),
+        # movespeed needs fixing
+        "movespeed": re.compile(r"(\d+)(?: bonus |% | |% bonus )movement speed", re.IGNORECASE),
+        "armor_penetration": re.compile(r"(\d+)% armor penetration"),
+        "magic_penetration": re.compile(r"(\d+).*? magic penetration"),
+        "lifesteal": re.compile(r"\d+.*? life steal"),
+        "omnivamp": re.compile(r"\d+.*? omni ?vamp"),
+        # "ability_power": re.compile(r"\+\d+% ability power"),
+        "ability_power": re.compile(r"(\d+)(?: |% |% bonus )ability power"),
+        "ability_power_percent": re.compile(r"(?:ability power by )(\d+)%"),
+        "ability_haste": re.compile(r"(\d+) ability haste"),
+        "attack_speed": re.compile(r"(\d+)(?:% bonus) attack speed"),
+        "health": re.compile(r"(\d+) (bonus health|health)"),
+        "bonus_attack_damage": re.compile(r"(\d+) bonus attack damage"),
+        "tenacity": re.compile(r"(\d+)% tenacity", re.IGNORECASE),
+        # onHit = re.compile(r"basic attack (?:.*?)(?: (?:as|in))?\d+ (?:bonus|seconds |deals).*? (\d+.*) (?:bonus|seconds|deals) (?:magic|physical)")
+        # test = re.compile(r"basic attack (?:.*?)(?: (?:as|in))?(\d+) (?:bonus|deals).*?")#taken from https://github.com/TheKevJames/league/blob/a62f5e3697392094aedd3d0bd1df37012824963b/league_utils/models/item/stats.py
+    }
+
+    # Lowercased keyword (with spaces removed) -> the stats whose pattern can only match if the keyword is present
+    keywords = {
+        "cooldownreduction": ("cooldown_reduction",),
+        "criticalstrikechance": ("critical_strike_chance",),
+        "lethality": ("lethality",),
+        "movementspeed": ("movespeed",),
+        "armorpenetration": ("armor_penetration",),
+        "magicpenetration": ("magic_penetration",),
+        "lifesteal": ("lifesteal",),
+        "omnivamp": ("omnivamp",),
+        "abilitypower": ("ability_power", "ability_power_percent"),
+        "abilityhaste": ("ability_haste",),
+        "attackspeed": ("attack_speed",),
+        "health": ("health",),
+        "bonusattackdamage": ("bonus_attack_damage",),
+        "tenacity": ("tenacity",),
+    }
+    rc_keywords = re.compile(
+        r"cooldown reduction|critical strike chance|lethality|movement speed|armor penetration|magic penetration"
+        r"|life steal|omni ?vamp|ability power|ability haste|attack speed|health|bonus attack damage|tenacity",
+        re.IGNORECASE,
+    )
+
+    @classmethod
+    def scan(cls, text: str) -> Dict[str, Match]:
+        """Return the first match of every stat pattern that matches `text`, keyed by stat name."""
+        stats = set()
+        for keyword in cls.rc_keywords.finditer(text):
+            stats.update(cls.keywords[keyword.group(0).lower().replace(" ", "")])
+        matches = {}
+        for stat in stats:
+            match = cls.patterns[stat].search(text)
+            if match is not None:
+                matches[stat] = match
+        return matches
+
+
 class WikiItem:
+    rc_digit = re.compile("[0-9]")
+    rc_letter = re.compile("[A-z]")
+    rc_cooldown = re.compile(r"(\d+ second cooldown)|(\d+ seconds cooldown)")
+    rc_range = re.compile(r"\d+ range")
+    rc_spec_tenacity = re.compile(r"((\d+)% TENACITY)")
+
     @classmethod
     def _parse_passives(cls, item_data: dict) -> List[Passive]:
         effects = []
-        not_unique = re.compile("[0-9]")
-        if not_unique.search(item_data["cdrunique"]):
+        if cls.rc_digit.search(item_data["cdrunique"]):
             cooldown = cls._parse_float(item_data["cdrunique"])
             description = "{}% cooldown reduction".format(cooldown)
             stats = cls._parse_passive_descriptions(description)
             effect = Passive(unique=True, name=None, effects=description, range=None, stats=stats, mythic=False)
             effects.append(effect)
-        if not_unique.search(item_data["critunique"]):
+        if cls.rc_digit.search(item_data["critunique"]):
             crit = cls._parse_float(item_data["critunique"])
             description = "{}% critical strike chance".format(crit)
             stats = cls._parse_passive_descriptions(description)
@@ -101,7 +175,6 @@ class WikiItem:
 
     @classmethod
     def _parse_actives(cls, item_data: dict) -> List[Active]:
-        get_cooldown = re.compile(r"(\d+ second cooldown)|(\d+ seconds cooldown)")
         effects = []
         passive = item_data["act"].strip()
         if passive:
@@ -112,8 +185,9 @@ class WikiItem:
                 passive_effects,
                 item_range,
             ) = cls._parse_passive_info(passive)
-            if get_cooldown.search(passive_effects):
-                cooldown = get_cooldown.search(passive_effects).group(0).split(" ", 1)
+            get_cooldown = cls.rc_cooldown.search(passive_effects)
+            if get_cooldown:
+                cooldown = get_cooldown.group(0).split(" ", 1)
                 cooldown = cls._parse_float(cooldown[0])
             else:
                 cooldown = None
@@ -167,9 +241,9 @@ class WikiItem:
 
         passive = passive.strip()
 
-        get_range = re.compile(r"\d+ range")
-        if get_range.search(passive):
-            item_range = get_range.search(passive).group(0).split(" ", 1)
+        get_range = cls.rc_range.search(passive)
+        if get_range:
+            item_range = get_range.group(0).split(" ", 1)
             item_range = cls._parse_int(item_range[0])
         else:
             item_range = None
@@ -177,117 +251,92 @@ class WikiItem:
 
     @classmethod
     def _parse_passive_descriptions(cls, passive: str) -> Stats:
-        # Regex stuff
-        cdr = re.compile(r"\d.* cooldown reduction")
-        crit = re.compile(r"\d.* critical strike chance")
-        lethality = re.compile(r"(\d.*) (?:lethality|Lethality)", re.IGNORECASE)
-        movespeed = re.compile(r"(\d+)(?: bonus |% | |% bonus )movement speed", re.IGNORECASE)  # movespeed needs fixing
-        armorpen = re.compile(r"(\d+)% armor penetration")
-        magicpen = re.compile(r"(\d+).*? magic penetration")
-        lifesteal = re.compile(r"\d+.*? life steal")
-        omnivamp = re.compile(r"\d+.*? omni ?vamp")
-        # ability_power = re.compile(r"\+\d+% ability power")
-        ability_power = re.compile(r"(\d+)(?: |% |% bonus )ability power")
-        ability_power_percent = re.compile(r"(?:ability power by )(\d+)%")
-        ability_haste = re.compile(r"(\d+) ability haste")
-        attack_speed = re.compile(r"(\d+)(?:% bonus) attack speed")
-        health_re = re.compile(r"(\d+) (bonus health|health)")
-        bonus_ad = re.compile(r"(\d+) bonus attack damage")
-        # onHit = re.compile(r"basic attack (?:.*?)(?: (?:as|in))?\d+ (?:bonus|seconds |deals).*? (\d+.*) (?:bonus|seconds|deals) (?:magic|physical)")
-        # test = re.compile(r"basic attack (?:.*?)(?: (?:as|in))?(\d+) (?:bonus|deals).*?")#taken from https://github.com/TheKevJames/league/blob/a62f5e3697392094aedd3d0bd1df37012824963b/league_utils/models/item/stats.py
+        matches = PassiveStatScanner.scan(passive)
         health = Health(flat=cls._parse_float(0.0))
         ad = AttackDamage(flat=cls._parse_float(0.0)),
-        tenacity_re = re.compile(r"(\d+)% TENACITY")
         # print(passive)
         if "Empowers each of your other Legendary items" in passive:
-            if health_re.search(passive):
+            if "health" in matches:
                 print(passive)
-                health = Health(flat=float(health_re.search(passive).groups()[0]))
+                health = Health(flat=float(matches["health"].groups()[0]))
 
             else:
                 health = Health(flat=cls._parse_float(0.0))
 
-            if bonus_ad.search(passive):
-                ad = AttackDamage(flat=cls._parse_float(bonus_ad.search(passive).groups()[0]))
-        if tenacity_re.search(passive.upper()):
-            tenacity = Tenacity(percent=cls._parse_float(tenacity_re.search(passive.upper()).groups()[0]))
+            if "bonus_attack_damage" in matches:
+                ad = AttackDamage(flat=cls._parse_float(matches["bonus_attack_damage"].groups()[0]))
+        if "tenacity" in matches:
+            tenacity = Tenacity(percent=cls._parse_float(matches["tenacity"].groups()[0]))
         else:
             tenacity = Tenacity(percent=cls._parse_float(0.0))
-        if cdr.search(passive):
-            cooldown = cdr.search(passive).group(0).split("%")[0]
+        if "cooldown_reduction" in matches:
+            cooldown = matches["cooldown_reduction"].group(0).split("%")[0]
             cooldown = cls._parse_float(cooldown)
         else:
             cooldown = 0.0
 
-        if movespeed.search(passive):
-            mvspeed = movespeed.search(passive).group(0)
-
-            if "%" in mvspeed:
-
-                movespeed = Movespeed(percent=float(movespeed.search(passive).groups()[0]))
+        if "movespeed" in matches:
+            mvspeed = matches["movespeed"]
+            if "%" in mvspeed.group(0):
+                movespeed = Movespeed(percent=float(mvspeed.groups()[0]))
             else:
-                movespeed = Movespeed(flat=float(movespeed.search(passive).groups()[0]))
+                movespeed = Movespeed(flat=float(mvspeed.groups()[0]))
         else:
             movespeed = 0.0
-        if crit.search(passive):
-            crit = crit.search(passive).group(0).split("%")[0]
+
+        if "critical_strike_chance" in matches:
+            crit = matches["critical_strike_chance"].group(0).split("%")[0]
             crit = cls._parse_float(crit)
         else:
             crit = 0.0
 
-        if ability_power.search(passive):
-            # ap = ability_power.search(passive).group(0).split("%")[0]
-            ap = ability_power.search(passive).groups()[0]
-            ap = cls._parse_float(ap)
+        if "ability_power" in matches:
+            ap = cls._parse_float(matches["ability_power"].groups()[0])
         else:
             ap = 0.0
 
-        if ability_power_percent.search(passive):
-            ap_percent = ability_power_percent.search(passive).groups()[0]
-            ap_percent = cls._parse_float(ap_percent)
+        if "ability_power_percent" in matches:
+            ap_percent = cls._parse_float(matches["ability_power_percent"].groups()[0])
         else:
             ap_percent = 0.0
 
-        if ability_haste.search(passive):
-            ah = ability_haste.search(passive).groups()[0]
-            ah = cls._parse_float(ah)
+        if "ability_haste" in matches:
+            ah = cls._parse_float(matches["ability_haste"].groups()[0])
         else:
             ah = 0.0
 
-        if lethality.search(passive):
-            lethal = lethality.search(passive).groups()[0]
-            lethal = cls._parse_float(lethal)
+        if "lethality" in matches:
+            lethal = cls._parse_float(matches["lethality"].groups()[0])
         else:
             lethal = 0.0
 
-        if armorpen.search(passive):
-            armorpen = armorpen.search(passive).groups()[0]
-            armorpen = cls._parse_float(armorpen)
+        if "armor_penetration" in matches:
+            armorpen = cls._parse_float(matches["armor_penetration"].groups()[0])
         else:
             armorpen = 0.0
 
-        if attack_speed.search(passive):
-            attack_speed = cls._parse_float(attack_speed.search(passive).groups()[0])
+        if "attack_speed" in matches:
+            attack_speed = cls._parse_float(matches["attack_speed"].groups()[0])
         else:
             attack_speed = cls._parse_float(0.0)
 
-        if magicpen.search(passive):
-            magpen = magicpen.search(passive).group(0)
-            if "%" in magpen:
-                magicpen = MagicPenetration(percent=float(magicpen.search(passive).groups()[0]))
+        if "magic_penetration" in matches:
+            magpen = matches["magic_penetration"]
+            if "%" in magpen.group(0):
+                magicpen = MagicPenetration(percent=float(magpen.groups()[0]))
             else:
-                magicpen = MagicPenetration(flat=float(magicpen.search(passive).groups()[0]))
+                magicpen = MagicPenetration(flat=float(magpen.groups()[0]))
         else:
             magicpen = MagicPenetration(flat=0.0)
 
-        if lifesteal.search(passive):
-            lifesteal = lifesteal.search(passive).group(0).split("%")[0]
+        if "lifesteal" in matches:
+            lifesteal = matches["lifesteal"].group(0).split("%")[0]
             lifesteal = cls._parse_float(lifesteal)
         else:
             lifesteal = 0.0
 
-        if omnivamp.search(passive):
-            omniv = omnivamp.search(passive).group(0).split("%")[0]
+        if "omnivamp" in matches:
+            omniv = matches["omnivamp"].group(0).split("%")[0]
             omniv = cls._parse_float(omniv)
         else:
             omniv = 0.0
@@ -455,7 +504,18 @@ class WikiItem:
         return tags
 
     @classmethod
-    def _parse_recipe_build(cls, item: str):
+    def _parse_recipe_build(cls, item: str, item_ids: Dict[str, Optional[int]] = None):
+        url = cls._recipe_build_url(item)
+        if item_ids is not None and url in item_ids:
+            return item_ids[url]
+        use_cache = True
+        html = download_soup(url, use_cache, dir="__wiki__")
+        soup = BeautifulSoup(html, "lxml")
+        code = soup.findAll("td", {"data-name": "code"})
+        return cls._parse_item_id(code=code[0].text)
+
+    @staticmethod
+    def _recipe_build_url(item: str) -> str:
         item = item.replace(" ", "_")
 
         if item in "Hextech_Alternator_Hextech_Alternator":
@@ -465,33 +525,108 @@ class WikiItem:
         elif item in "Ruby_Crystal_Ruby_Crystal":
             item = "Ruby_Crystal"
 
-        url = "https://leagueoflegends.fandom.com/wiki/Template:Item_data_" + item
-        use_cache = True
-        html = download_soup(url, use_cache, dir="__wiki__")
-        soup = BeautifulSoup(html, "lxml")
-        code = soup.findAll("td", {"data-name": "code"})
-        return cls._parse_item_id(code=code[0].text)
+        return "https://leagueoflegends.fandom.com/wiki/Template:Item_data_" + item
 
     @classmethod
     def get(cls, url: str) -> Optional[Item]:
+        item_data = cls.get_item_data(url)
+        return cls.from_item_data(item_data)
+
+    @classmethod
+    def from_item_data(cls, item_data: Dict[str, str], item_ids: Dict[str, Optional[int]] = None) -> Item:
+        """Parse an item from its template data.
+
+        `item_ids` maps template urls to item ids (see `get_item_ids`). The components and upgrades of the item are
+        looked up in it, and only the templates that aren't in it are downloaded to read their ids.
+        """
+        item = cls._parse_item_data(item_data, item_ids)
+        return item
+
+    @classmethod
+    def get_item_ids(cls, item_data_by_url: Dict[str, Dict[str, str]]) -> Dict[str, Optional[int]]:
+        """Map the url of each item template to the id of its item, from the already downloaded template data."""
+        return {url: cls._parse_item_id(item_data["code"]) for url, item_data in item_data_by_url.items()}
+
+    @classmethod
+    def get_component_urls(cls, item_data: Iterable[Dict[str, str]]) -> List[str]:
+        """The urls of the templates of the items that the items build into or from, as `_parse_item_data` reads them."""
+        names = []
+        for data in item_data:
+            if cls.rc_letter.search(data["builds"]):
+                names.extend(data["builds"].split(","))
+            if cls.rc_letter.match(data["recipe"]):
+                names.extend(data["recipe"].split(","))
+        return list(dict.fromkeys(cls._recipe_build_url(name.strip()) for name in names))
+
+    # The cells of a template's table that _parse_item_data reads without checking for them
+    ITEM_DATA_CELLS = ("1", "code", "builds", "recipe", "noe", "nickname", "spec", "act", "buy", "comb", "sell")
+
+    @classmethod
+    def prefetch_item_data(cls, urls: List[str], batch_size: int = 50):
+        """Download the templates at `urls` that aren't cached yet in batches, instead of one page per template.
+
+        Each batch is rendered by a single call to the wiki's parse API, with every template wrapped in a div that
+        records its url. The rendered table of each template is cached in the file that `get_item_data` reads, so
+        nothing downstream changes. Templates whose table didn't come back with all the ITEM_DATA_CELLS, e.g. because
+        the API returned an error for their batch, are left to `get_item_data`, which falls back to downloading their
+        page.
+
+        The rendered tables haven't been compared with the ones of the downloaded pages yet, so this is only used when
+        the items are built with --prefetch.
+        """
+        urls = [url for url in dict.fromkeys(urls) if not os.path.exists(cache_filename(url, "__wiki__"))]
+        prefetched = 0
+        for i in range(0, len(urls), batch_size):
+            batch = urls[i : i + batch_size]
+            # The data templates call the template named by their first argument, which is "Item data" (the table
+            # with the "data-name" cells) when the page itself is viewed. It has to be passed explicitly here.
+            text = "".join(
+                f'<div data-template-url="{url}">\n{{{{{wiki_page_title(url)}|Item data}}}}\n</div>\n' for url in batch
+            )
+            response = requests.post(
+                WikiCache.API_URL,
+                data={
+                    "action": "parse",
+                    "text": text,
+                    "contentmodel": "wikitext",
+                    "prop": "text",
+                    "disablelimitreport": 1,
+                    "format": "json",
+                },
+            )
+            response.raise_for_status()
+            response = response.json()
+            if "parse" not in response:
+                print(f"WARNING: Could not prefetch {len(batch)} item templates: {response.get('error')}")
+                continue
+            soup = BeautifulSoup(response["parse"]["text"]["*"], "lxml")
+            for div in soup.find_all("div", attrs={"data-template-url": True}):
+                url = div["data-template-url"]
+                if url in batch and all(cell in read_template_table(div) for cell in cls.ITEM_DATA_CELLS):
+                    filename = cache_filename(url, "__wiki__")
+                    os.makedirs(os.path.dirname(filename), exist_ok=True)
+                    with open(filename, "w", encoding="utf-8") as f:
+                        f.write(str(div))
+                    prefetched += 1
+        if urls:
+            print(f"Prefetched {prefetched} of {len(urls)} item templates, the rest are downloaded one page at a time")
+
+    @classmethod
+    def get_item_data(cls, url: str) -> Dict[str, str]:
         # All item data has a html attribute "data-name" so I put them all in an ordered dict while stripping the new lines and spaces from the data
         # use_cache = False
+        if not os.path.exists(cache_filename(url, "__wiki__")):
+            print(url)
         html = download_soup(url, True, "__wiki__")
+        return cached_parse("item-data-v2", url, html, cls._read_item_data)
+
+    @staticmethod
+    def _read_item_data(html: str) -> Dict[str, str]:
         soup = BeautifulSoup(html, "lxml")
-        item_data = OrderedDict()
-        for td in soup.findAll("td", {"data-name": True}):
-            attributes = td.find_previous("td").text.rstrip()
-            attributes = attributes.lstrip()
-            values = td.text.rstrip()
-            # replace("\n", "")
-            values = values.lstrip().rstrip()
-            item_data[attributes] = values
-        item = cls._parse_item_data(item_data)
-        return item
+        return read_template_table(soup)
 
     @classmethod
-    def _parse_item_data(cls, item_data: dict) -> Item:
-        not_unique = re.compile("[A-z]")
+    def _parse_item_data(cls, item_data: dict, item_ids: Dict[str, Optional[int]] = None) -> Item:
         builds_into = []
         builds_from = []
         nicknames = []
@@ -534,12 +669,12 @@ class WikiItem:
                 rank = None
         else:
             rank = []
-        if not_unique.match(item_data["noe"]):
+        if cls.rc_letter.match(item_data["noe"]):
             no_effects = True
         else:
             no_effects = False
 
-        if not_unique.search(item_data["nickname"]):
+        if cls.rc_letter.search(item_data["nickname"]):
             nickname = item_data["nickname"]
             if "," in nickname:
                 for i in nickname.split(","):
@@ -547,33 +682,33 @@ class WikiItem:
             else:
                 nicknames.append(nickname.strip())
 
-        if not_unique.search(item_data["builds"]):
+        if cls.rc_letter.search(item_data["builds"]):
             build = item_data["builds"]
             if "," in build:
                 for i in build.split(","):
-                    i = cls._parse_recipe_build(i.strip())
+                    i = cls._parse_recipe_build(i.strip(), item_ids)
                     if i is not None:
                         builds_into.append(i)
                     else:
                         continue
             else:
-                build = cls._parse_recipe_build(build.strip())
+                build = cls._parse_recipe_build(build.strip(), item_ids)
                 builds_into.append(build)
 
-        if not_unique.match(item_data["recipe"]):
+        if cls.rc_letter.match(item_data["recipe"]):
             component = item_data["recipe"]
             if "," in component:
                 for i in component.split(","):
-                    i = cls._parse_recipe_build(i.strip())
+                    i = cls._parse_recipe_build(i.strip(), item_ids)
                     if i is not None:
                         builds_from.append(i)
                     else:
                         continue
             else:
-                component = cls._parse_recipe_build(component.strip())
+                component = cls._parse_recipe_build(component.strip(), item_ids)
                 builds_from.append(component)
         if "TENACITY" in item_data["spec"].upper():
-            tenacity = Tenacity(cls._parse_float(re.search(r"((\d+)% TENACITY)",item_data["spec"].upper()).groups()[0]))
+            tenacity = Tenacity(cls._parse_float(cls.rc_spec_tenacity.search(item_data["spec"].upper()).groups()[0]))
             print(tenacity)
         else:
             tenacity = Tenacity(cls._parse_float(0.0))